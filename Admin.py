@@ -0,0 +1,47 @@
+import streamlit as st
+
+from tracing import TRACE_FILE, load_spans, prometheus_text, summarize_spans
+
+# Page content
+st.title("Admin: latency and token spend")
+st.caption(f"Spans recorded in {TRACE_FILE or '(trace file disabled)'}")
+
+# Aggregate the recorded spans per lab, model and stage
+spans = load_spans()
+if not spans:
+    st.info("No spans recorded yet. Use the labs and come back.")
+else:
+    rows = summarize_spans(spans)
+    labs = sorted({row["lab"] for row in rows})
+    selected_labs = st.multiselect("Labs", labs, default=labs)
+    rows = [row for row in rows if row["lab"] in selected_labs]
+
+    # Token spend per lab and model
+    st.subheader("Token spend")
+    spend = {}
+    for row in rows:
+        totals = spend.setdefault((row["lab"], row["model"]), {"prompt_tokens": 0, "completion_tokens": 0})
+        totals["prompt_tokens"] += row["prompt_tokens"]
+        totals["completion_tokens"] += row["completion_tokens"]
+    st.dataframe(
+        [{"lab": lab, "model": model, **totals} for (lab, model), totals in sorted(spend.items())],
+        use_container_width=True,
+    )
+
+    # Hit rate of the response caches (Lab 4 similar questions, Lab 5 suggestions)
+    cache_rows = [row for row in rows if row["hit_rate"] is not None]
+    if cache_rows:
+        st.subheader("Response caches")
+        st.dataframe(
+            [{"lab": row["lab"], "cache": row["span"], "lookups": row["count"], "hit_rate": row["hit_rate"]} for row in cache_rows],
+            use_container_width=True,
+        )
+
+    # Latency per stage
+    st.subheader("Latency (ms)")
+    st.dataframe(rows, use_container_width=True)
+    st.caption(f"Based on the last {len(spans)} spans.")
+
+# Same numbers for scrapers (only spans from this server process)
+with st.expander("Prometheus metrics"):
+    st.code(prometheus_text(), language="text")
@@ -1,5 +1,29 @@
+import uuid
+
 import streamlit as st
-from openai import OpenAI, APIError
+from openai import APIError
+
+from document_loader import SUPPORTED_TYPES, get_fingerprint
+from embeddings import EmbeddingService
+from rag_cache import RagCache, cache_key
+from session_index import SessionIndexes, build_document_index
+from shared_clients import get_async_openai_client, get_openai_client, verify_openai_key
+
+# Retrieval settings for questions about the uploaded document
+CHAT_MODEL = "gpt-4o"
+TOP_K_PASSAGES = 6  # maximum number of passages sent to the model
+CONTEXT_TOKEN_BUDGET = 4000  # token budget for the retrieved passages in the prompt
+
+# Function to get the process-wide registry of per-session document indexes
+@st.cache_resource
+def get_session_indexes():
+    return SessionIndexes()
+
+# Function to get the process-wide in-memory cache of query embeddings and answers.
+# Entries are keyed by the document's content hash, so they never leak between documents.
+@st.cache_resource
+def get_rag_cache():
+    return RagCache(":memory:")
 
 # Show title and description.
 st.title("LAB 1 -- Tanu Rana 📄 Document question answering")
@@ -16,14 +40,14 @@ if not openai_api_key:
     st.info("Please add your OpenAI API key to continue.", icon="🗝️")
 else:
     try:
-        # Create an OpenAI client.
-        client = OpenAI(api_key=openai_api_key)
-        client.models.list()
+        # Get the shared OpenAI client and check the key (the check is cached per process).
+        client = get_openai_client(openai_api_key)
+        verify_openai_key(openai_api_key)
 
         
         # Let the user upload a file via `st.file_uploader`.
         uploaded_file = st.file_uploader(
-            "Upload a document (.txt or .md)", type=("txt", "md")
+            "Upload a document (.txt, .md, .pdf or .html)", type=SUPPORTED_TYPES
         )
 
         # Ask the user for a question via `st.text_area`.
@@ -33,25 +57,47 @@ else:
             disabled=not uploaded_file,
         )
 
-        if uploaded_file and question:
-
-            # Process the uploaded file and question.
-            document = uploaded_file.read().decode()
-            messages = [
-                {
-                    "role": "user",
-                    "content": f"Here's a document: {document} \n\n---\n\n {question}",
-                }
-            ]
-
-            # Generate an answer using the OpenAI API.
-            stream = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                stream=True,
-            )
-
-            # Stream the response to the app using `st.write_stream`.
-            st.write_stream(stream)
+        # Each session gets its own key for the index registry
+        if "session_key" not in st.session_state:
+            st.session_state.session_key = uuid.uuid4().hex
+
+        if not uploaded_file:
+            get_session_indexes().evict(st.session_state.session_key)
+
+        else:
+            # Index the upload once: chunks are embedded and kept in memory for this session,
+            # so every question only sends the passages relevant to it
+            fingerprint = get_fingerprint(uploaded_file, st.session_state)
+            document_index = get_session_indexes().get(st.session_state.session_key, fingerprint)
+            if document_index is None:
+                with st.spinner("Indexing the document..."):
+                    document_index = build_document_index(
+                        uploaded_file,
+                        fingerprint,
+                        EmbeddingService(client, lab="lab1"),
+                        get_async_openai_client(openai_api_key),
+                        get_rag_cache(),
+                        CHAT_MODEL,
+                        TOP_K_PASSAGES,
+                        CONTEXT_TOKEN_BUDGET,
+                    )
+                get_session_indexes().put(st.session_state.session_key, document_index)
+
+            if question:
+                # Repeat questions on the same document are answered from the cache
+                answer_key = cache_key(question, fingerprint, CHAT_MODEL)
+                cached_answer = get_rag_cache().get_answer(answer_key)
+                if cached_answer:
+                    st.markdown(cached_answer[0])
+                else:
+                    # Retrieve the relevant passages and stream the answer
+                    turn = document_index.pipeline.answer(question, "hybrid", fingerprint)
+                    answer = st.write_stream(turn["pieces"])
+                    if answer:
+                        get_rag_cache().put_answer(answer_key, answer)
+                    st.caption(
+                        f"Answered from {len(turn['passages'])} of {document_index.count()} passages "
+                        f"({turn['context']['tokens']} tokens)."
+                    )
     except APIError as e:
         st.error("Invalid API Key. Please enter a valid OpenAI API key.")
\ No newline at end of file
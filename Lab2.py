@@ -1,5 +1,9 @@
 import streamlit as st
-from openai import OpenAI
+
+from shared_clients import get_openai_client
+from document_loader import SUPPORTED_TYPES, get_fingerprint, iter_document_chunks
+from summarizer import SECTION_SIZE, stream_sections_summary, summary_cache
+from tracing import trace_chat_stream
 
 # Show title and description.
 st.title("LAB 2 -- Tanu Rana 📄 Document question answering")
@@ -19,12 +23,12 @@ if not openai_api_key:
     st.info("Please add your OpenAI API key to continue.", icon="🗝️")
 else:
 
-    # Create an OpenAI client.
-    client = OpenAI(api_key=openai_api_key)
+    # Get the shared OpenAI client.
+    client = get_openai_client(openai_api_key)
 
     # Let the user upload a file via `st.file_uploader`.
     uploaded_file = st.file_uploader(
-        "Upload a document (.txt or .md)", type=("txt", "md")
+        "Upload a document (.txt, .md, .pdf or .html)", type=SUPPORTED_TYPES
     )
 
     # Sidebar options for summarizing 
@@ -46,29 +50,40 @@ else:
 
     if uploaded_file:
 
-        # Process the uploaded file
-        document = uploaded_file.read().decode()
-
         # Instruction based on user selection on the sidebar menu
         instruction = f"Summarize the document in {summary_options.lower()}."
 
-        # Prepare the messages for the LLM
-        messages = [
-            {
-                "role": "user",
-                "content": f"Here's a document: {document} \n\n---\n\n {instruction}",
-            }
-        ]
-
-        # Generate the summary using the OpenAI API.
-        stream = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            stream=True,
-        )
-
-        # Stream the response to the app using `st.write_stream`.
-        st.write_stream(stream)
+        # Reruns (e.g. typing in another widget) re-render the stored summary instead of
+        # generating it again; only a new document, format or model starts a new request
+        summary_key = summary_cache.key(get_fingerprint(uploaded_file, st.session_state), instruction, model)
+        summary = summary_cache.get(summary_key)
+        if summary is not None:
+            st.markdown(summary)
+        else:
+            # Long documents are summarized section by section first; show progress as sections finish
+            progress = st.empty()
+
+            # The number of sections is only known once the whole upload has been read
+            def show_progress(done, total):
+                if total:
+                    progress.progress(done / total, text=f"Summarized section {done} of {total}")
+                else:
+                    progress.progress(done / (done + 1), text=f"Summarized section {done}")
+
+            # Generate the summary using the OpenAI API.
+            stream = stream_sections_summary(
+                client,
+                (chunk["text"] for chunk in iter_document_chunks(uploaded_file, SECTION_SIZE, 0)),
+                instruction,
+                model,
+                on_progress=show_progress,
+                lab="lab2",
+            )
+            progress.empty()
+
+            # Stream the response to the app using `st.write_stream`.
+            summary = st.write_stream(trace_chat_stream(stream, "lab2", model, name="summary"))
+            summary_cache.put(summary_key, summary)
 
     # # Ask the user for a question via `st.text_area`.
     # question = st.text_area(
@@ -1,5 +1,10 @@
 import streamlit as st
-from openai import OpenAI
+
+from conversation_memory import ConversationMemory
+from shared_clients import get_openai_client
+from document_loader import SUPPORTED_TYPES, get_fingerprint, iter_document_chunks
+from summarizer import SECTION_SIZE, stream_sections_summary, summary_cache
+from tracing import STREAM_USAGE, trace_chat_stream
 
 # Show title and description.
 st.title("LAB 3 -- Tanu Rana 📄 Document question answering and Chatbot")
@@ -15,11 +20,11 @@ openai_api_key = st.secrets["openai_api_key"]
 if not openai_api_key:
     st.info("Please add your OpenAI API key to continue.", icon="🗝️")
 else:
-    # Create an OpenAI client
-    client = OpenAI(api_key=openai_api_key)
+    # Get the shared OpenAI client
+    client = get_openai_client(openai_api_key)
 
     # Let the user upload a file via `st.file_uploader`.
-    uploaded_file = st.file_uploader("Upload a document (.txt or .md)", type=("txt", "md"))
+    uploaded_file = st.file_uploader("Upload a document (.txt, .md, .pdf or .html)", type=SUPPORTED_TYPES)
 
     # Sidebar options for summarizing 
     st.sidebar.title("Options")
@@ -39,76 +44,74 @@ else:
     )
 
     if uploaded_file:
-        # Process the uploaded file
-        document = uploaded_file.read().decode()
-
         # Instruction based on user selection on the sidebar menu
         instruction = f"Summarize the document in {summary_options.lower()}."
 
-        # Prepare the messages for the LLM
-        messages = [
-            {
-                "role": "user",
-                "content": f"Here's a document: {document} \n\n---\n\n {instruction}",
-            }
-        ]
-
-        # Generate the summary using the OpenAI API
-        stream = client.chat.completions.create(
-            model=model_to_use,
-            messages=messages,
-            stream=True,
-        )
-
-        # Stream the summary response to the app
-        st.write_stream(stream)
-
-    # Set up the session state to hold chatbot messages with a buffer limit
-    if "chat_history" not in st.session_state:
-        st.session_state["chat_history"] = [
-            {"role": "assistant", "content": "How can I help you?"}
-        ]
-
-    # Define the conversation buffer size (2 user messages and 2 responses)
-    conversation_buffer_size = 4  # 2 user messages + 2 assistant responses
-
-    def manage_conversation_buffer():
-        """Ensure the conversation buffer size does not exceed the limit."""
-        if len(st.session_state.chat_history) > conversation_buffer_size:
-            # Keep only the last `conversation_buffer_size` messages
-            st.session_state.chat_history = st.session_state.chat_history[-conversation_buffer_size:]
+        # Reruns (e.g. typing in another widget) re-render the stored summary instead of
+        # generating it again; only a new document, format or model starts a new request
+        summary_key = summary_cache.key(get_fingerprint(uploaded_file, st.session_state), instruction, model_to_use)
+        summary = summary_cache.get(summary_key)
+        if summary is not None:
+            st.markdown(summary)
+        else:
+            # Long documents are summarized section by section first; show progress as sections finish
+            progress = st.empty()
+
+            # The number of sections is only known once the whole upload has been read
+            def show_progress(done, total):
+                if total:
+                    progress.progress(done / total, text=f"Summarized section {done} of {total}")
+                else:
+                    progress.progress(done / (done + 1), text=f"Summarized section {done}")
+
+            # Generate the summary using the OpenAI API
+            stream = stream_sections_summary(
+                client,
+                (chunk["text"] for chunk in iter_document_chunks(uploaded_file, SECTION_SIZE, 0)),
+                instruction,
+                model_to_use,
+                on_progress=show_progress,
+                lab="lab3",
+            )
+            progress.empty()
+
+            # Stream the summary response to the app
+            summary = st.write_stream(trace_chat_stream(stream, "lab3", model_to_use, name="summary"))
+            summary_cache.put(summary_key, summary)
+
+    # Set up the session state to hold the chatbot memory: a rolling summary of older
+    # turns plus the most recent turns verbatim, so every prompt stays within a fixed budget
+    if "chat_memory" not in st.session_state:
+        st.session_state["chat_memory"] = ConversationMemory(client, lab="lab3")
+        st.session_state.chat_memory.add("assistant", "How can I help you?")
+    chat_memory = st.session_state.chat_memory
 
     # Display the chatbot conversation
     st.write("## Chatbot Interaction")
-    for msg in st.session_state.chat_history:
+    for msg in chat_memory.messages:
         chat_msg = st.chat_message(msg["role"])
         chat_msg.write(msg["content"])
 
     # Get user input for the chatbot
     if prompt := st.chat_input("Ask the chatbot a question or interact:"):
-        # Append the user input to the session state
-        st.session_state.chat_history.append({"role": "user", "content": prompt})
+        # Add the user input to the conversation memory
+        chat_memory.add("user", prompt)
 
         # Display the user input in the chat
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Ensure the conversation buffer size does not exceed the limit
-        manage_conversation_buffer()
-
         # Generate a response from OpenAI using the same model
         stream = client.chat.completions.create(
             model=model_to_use,
-            messages=st.session_state.chat_history,
+            messages=chat_memory.context_messages(),
             stream=True,
+            stream_options=STREAM_USAGE,
         )
 
         # Stream the assistant's response
         with st.chat_message("assistant"):
-            response = st.write_stream(stream)
-
-        # Append the assistant's response to the session state
-        st.session_state.chat_history.append({"role": "assistant", "content": response})
+            response = st.write_stream(trace_chat_stream(stream, "lab3", model_to_use))
 
-        # Ensure the conversation buffer size does not exceed the limit
-        manage_conversation_buffer()
\ No newline at end of file
+        # Add the assistant's response to the conversation memory
+        chat_memory.add("assistant", response)
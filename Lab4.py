@@ -1,117 +1,106 @@
-import sys
+import time
 import streamlit as st
-from openai import OpenAI
-from PyPDF2 import PdfReader
 import os
 
-# Workaround for sqlite3 issue in Streamlit Cloud
-__import__('pysqlite3')
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+from bm25_index import tokenize
+from corpus_index import VECTOR_STORE_CONFIG, get_corpus_index
+from rag_cache import RagCache, cache_key
+from rag_pipeline import RagPipeline
+from semantic_cache import SemanticCache
+from shared_clients import client_metrics, get_async_openai_client
 
-import chromadb
+# Retrieval settings (chunking and vector store settings live in corpus_index.py)
+TOP_K_PASSAGES = 5  # maximum number of passages sent to the model
+CONTEXT_TOKEN_BUDGET = 3000  # token budget for the retrieved passages in the prompt
 
-# Function to initialize the OpenAI client
-def initialize_openai_client():
-    if 'openai_api' not in st.session_state:
-        # Get the API key from Streamlit secrets
-        api_key = st.secrets["openai_api_key"]
-        # Initialize the OpenAI client and store it in session state
-        st.session_state.openai_api = OpenAI(api_key=api_key)
+# Answer cache settings
+CHAT_MODEL = "gpt-4o"
+ANSWER_CACHE_TTL_SECONDS = 24 * 60 * 60  # cached answers expire after a day
+ANSWER_CACHE_MAX_ENTRIES = 500  # least recently used answers are evicted beyond this
 
-# Function to create a vector database collection for documents
+# Paraphrased questions reuse the answer to a question whose embedding is at least this similar
+SIMILAR_ANSWER_THRESHOLD = 0.92
+SIMILAR_ANSWER_MAX_ENTRIES = 1000
+
+# Function to get the process-wide document corpus. Its ingestion runs on a background thread
+# (streamlit_app.py starts it at server start-up), which then re-indexes data_lab4 whenever
+# PDFs are added, changed or removed.
+def get_corpus():
+    return get_corpus_index(st.secrets["openai_api_key"])
+
+# Function to get the document collection, waiting for the background warm-up if needed
 def initialize_document_collection():
     if 'document_vector_db' not in st.session_state:
-        # Set up the ChromaDB client
-        db_path = os.path.join(os.getcwd(), "chroma_storage")
-        db_client = chromadb.PersistentClient(path=db_path)
-        document_collection = db_client.get_or_create_collection("DocumentLabCollection")
+        corpus = get_corpus()
+        if not corpus.ready:
+            # Show the warm-up progress while new or modified PDFs are ingested
+            progress = st.progress(0.0, text="Indexing documents...")
+            while not corpus.wait(0.5):
+                done, total, pdf_file = corpus.progress
+                if total:
+                    progress.progress(done / total, text=f"Processed {pdf_file} ({done}/{total})")
+            progress.empty()
+        if corpus.error:
+            st.error(f"{corpus.error} (retrying in the background, reload the page in a minute)")
+            return None
+        for pdf_file, message in corpus.errors.items():
+            st.error(f"Error processing {pdf_file}: {message}")
+        st.session_state.extraction_timings = corpus.extraction_timings
+        use_live_index(corpus.snapshot())
+
+    return st.session_state.document_vector_db
 
-        initialize_openai_client()
+# Function to point the session at a version of the index. The version ties cached queries
+# and answers to it, and the whole snapshot is kept so one question never mixes two versions.
+def use_live_index(live_index):
+    st.session_state.live_index = live_index
+    st.session_state.index_version = live_index["index_version"]
+    st.session_state.document_vector_db = live_index["collection"]
 
-        # Define the directory containing the PDF files
-        pdf_folder = os.path.join(os.getcwd(), "data_lab4")
-        if not os.path.exists(pdf_folder):
-            st.error(f"PDF folder not found: {pdf_folder}")
-            return None
+# Function to get the async retrieval and generation pipeline for a version of the index.
+# Pipelines are shared by every session; the one for the replaced index is kept until the
+# next swap so sessions still on it can finish.
+@st.cache_resource(max_entries=2)
+def get_rag_pipeline(index_version, _live_index):
+    return RagPipeline(
+        get_async_openai_client(st.secrets["openai_api_key"]),
+        _live_index["collection"],
+        _live_index["bm25_index"],
+        get_rag_cache(),
+        CHAT_MODEL,
+        TOP_K_PASSAGES,
+        CONTEXT_TOKEN_BUDGET,
+        dimensions=VECTOR_STORE_CONFIG.get("dimensions"),
+    )
 
-        # Process each PDF file in the folder
-        for pdf_file in os.listdir(pdf_folder):
-            if pdf_file.endswith(".pdf"):
-                pdf_path = os.path.join(pdf_folder, pdf_file)
-                try:
-                    # Extract text from the PDF
-                    with open(pdf_path, "rb") as file:
-                        pdf_reader = PdfReader(file)
-                        text_content = ''.join([page.extract_text() or '' for page in pdf_reader.pages])
-
-                    # Generate embeddings for the extracted text
-                    response = st.session_state.openai_api.embeddings.create(
-                        input=text_content, model="text-embedding-3-small"
-                    )
-                    doc_embedding = response.data[0].embedding
-
-                    # Add the document to ChromaDB
-                    document_collection.add(
-                        documents=[text_content],
-                        metadatas=[{"filename": pdf_file}],
-                        ids=[pdf_file],
-                        embeddings=[doc_embedding]
-                    )
-                except Exception as error:
-                    st.error(f"Error processing {pdf_file}: {str(error)}")
-
-        # Store the collection in session state
-        st.session_state.document_vector_db = document_collection
+# Function to get the pipeline for the index version this session uses
+def get_session_pipeline():
+    return get_rag_pipeline(st.session_state.index_version, st.session_state.live_index)
 
-    return st.session_state.document_vector_db
+# Function to get the process-wide cache of query embeddings, retrieved ids and answers
+@st.cache_resource
+def get_rag_cache():
+    return RagCache(
+        os.path.join(os.getcwd(), "rag_cache.sqlite3"),
+        answer_ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        max_answers=ANSWER_CACHE_MAX_ENTRIES,
+    )
+
+# Function to get the process-wide cache of answers looked up by question similarity
+@st.cache_resource
+def get_similar_answer_cache():
+    return SemanticCache(
+        threshold=SIMILAR_ANSWER_THRESHOLD,
+        max_entries=SIMILAR_ANSWER_MAX_ENTRIES,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        name="similar_answer_cache",
+        lab="lab4",
+    )
 
-# Function to query the document vector database
-def search_vector_db(db_collection, search_query):
-    initialize_openai_client()
-    try:
-        # Generate embedding for the query
-        response = st.session_state.openai_api.embeddings.create(
-            input=search_query, model="text-embedding-3-small"
-        )
-        query_embedding = response.data[0].embedding
-
-        # Query the ChromaDB collection
-        search_results = db_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=3
-        )
-        return search_results['documents'][0], [result['filename'] for result in search_results['metadatas'][0]]
-    except Exception as error:
-        st.error(f"Error during the query: {str(error)}")
-        return [], []
-
-# Function to generate chatbot response using GPT model
-def generate_chatbot_reply(user_query, document_context):
-    initialize_openai_client()
-    # Construct the prompt for the GPT model
-    prompt_text = f"""You are an AI assistant with knowledge from specific documents. Use the following context to answer the user's question. If the information is not in the context, say you don't know based on the available information.
-
-Context:
-{document_context}
-
-User Question: {user_query}
-
-Answer:"""
-
-    try:
-        # Generate streaming response using OpenAI's chat completion
-        response_stream = st.session_state.openai_api.chat.completions.create(
-            model="gpt-4o",  # Using the GPT-4 model
-            messages=[
-                {"role": "system", "content": "You are an intelligent and helpful assistant."},
-                {"role": "user", "content": prompt_text}
-            ],
-            stream=True  # Enable streaming
-        )
-        return response_stream
-    except Exception as error:
-        st.error(f"Error getting chatbot response: {str(error)}")
-        return None
+# Function to get the terms of a question that a paraphrase must repeat exactly: course codes
+# and other numbers ("IST 652" -> ("652", "ist652")), which embeddings barely tell apart
+def exact_terms(question):
+    return tuple(sorted({term for term in tokenize(question) if any(char.isdigit() for char in term)}))
 
 # Initialize session state for chat history and system readiness
 if 'chat_log' not in st.session_state:
@@ -133,9 +122,22 @@ if not st.session_state.is_system_ready:
             # Set the system as ready and show a success message
             st.session_state.is_system_ready = True
             st.success("AI Assistant is ready to chat!")
+            # Show how long each newly ingested PDF took to extract
+            if st.session_state.get("extraction_timings"):
+                with st.expander("PDF extraction timings"):
+                    for pdf_file, seconds in sorted(st.session_state.extraction_timings.items()):
+                        st.write(f"- {pdf_file}: {seconds:.2f}s")
         else:
             st.error("Failed to load the document collection. Please check the file path and try again.")
 
+# Switch to a newer index between questions once the background re-indexing swapped it in
+if st.session_state.is_system_ready:
+    live_index = get_corpus().snapshot()
+    if live_index and live_index["index_version"] != st.session_state.get("index_version"):
+        use_live_index(live_index)
+        st.session_state.doc_collection = live_index["collection"]
+        st.toast("The documents changed: answers now use the updated index.")
+
 # Only display chat interface if the system is ready
 if st.session_state.is_system_ready and st.session_state.doc_collection:
     st.subheader("Ask the AI Assistant about the documents")
@@ -153,6 +155,9 @@ if st.session_state.is_system_ready and st.session_state.doc_collection:
             with st.chat_message("user" if sender == "You" else "assistant"):
                 st.markdown(content)
 
+    # Retrieval mode: hybrid fuses keyword (BM25) and embedding results
+    retrieval_mode = st.sidebar.radio("Retrieval mode", ("hybrid", "vector", "bm25"))
+
     # User input
     user_query = st.chat_input("Ask a question about the uploaded documents:")
 
@@ -161,31 +166,110 @@ if st.session_state.is_system_ready and st.session_state.doc_collection:
         with st.chat_message("user"):
             st.markdown(user_query)
 
-        # Query the vector database
-        matched_texts, matched_docs = search_vector_db(st.session_state.doc_collection, user_query)
-        doc_context = "\n".join(matched_texts)
-
-        # Get the chatbot response
-        response_stream = generate_chatbot_reply(user_query, doc_context)
+        # Reuse a cached answer for a repeated question, then (in the modes that embed the
+        # question anyway) for a paraphrase of an answered question, otherwise retrieve and
+        # generate. Paraphrases must mention the same course codes and numbers.
+        index_version = st.session_state.get("index_version")
+        answer_key = cache_key(user_query, index_version, CHAT_MODEL, retrieval_mode)
+        answer_scope = (index_version, CHAT_MODEL, retrieval_mode, exact_terms(user_query))
+        cached_answer = get_rag_cache().get_answer(answer_key)
+        prepared = None
+        if not cached_answer and retrieval_mode != "bm25":
+            try:
+                prepared = get_session_pipeline().prepare(user_query, retrieval_mode, index_version)
+                similar_answer = get_similar_answer_cache().get(answer_scope, prepared["query_embedding"])
+                if similar_answer:
+                    cached_answer = similar_answer[:2]
+            except Exception:
+                # The similarity lookup is only a shortcut; answer the question normally
+                prepared = None
+        if cached_answer:
+            cached_text, cached_metadata = cached_answer
+            matched_docs = cached_metadata.get("passages", [])
+            context = None
+            stage_timings = {}
+            # A cached answer is shown at once: replaying it slowly would cost the time it saves
+            response_pieces = iter([cached_text])
+        else:
+            # Retrieve (BM25 and vector lookups run concurrently), fit the passages into the
+            # token budget, then stream the answer from the shared async pipeline
+            try:
+                turn = get_session_pipeline().answer(
+                    user_query, retrieval_mode, index_version, prepared
+                )
+                matched_docs = turn["passages"]
+                context = turn["context"]
+                stage_timings = turn["timings"]
+                response_pieces = turn["pieces"]
+            except Exception as error:
+                st.error(f"Error during the query: {str(error)}")
+                matched_docs, context, stage_timings, response_pieces = [], None, {}, iter([])
 
         # Display AI response
         with st.chat_message("assistant"):
             response_holder = st.empty()
             complete_response = ""
-            for part in response_stream:
-                if part.choices[0].delta.content is not None:
-                    complete_response += part.choices[0].delta.content
+            stream_completed = False
+            try:
+                for piece in response_pieces:
+                    complete_response += piece
                     response_holder.markdown(complete_response + "▌")
+                stream_completed = True
+            except Exception as error:
+                st.error(f"Error getting chatbot response: {str(error)}")
             response_holder.markdown(complete_response)
 
+        # Cache the generated answer together with the passages it was based on (never the
+        # partial text of a stream that failed)
+        if not cached_answer and stream_completed and complete_response:
+            passage_refs = [
+                {"filename": passage["filename"], "page": passage.get("page")}
+                for passage in matched_docs
+            ]
+            get_rag_cache().put_answer(answer_key, complete_response, {"passages": passage_refs})
+            if prepared is not None:
+                get_similar_answer_cache().put(answer_scope, complete_response, prepared["query_embedding"], {"passages": passage_refs})
+
         # Add messages to chat history (new format)
         st.session_state.chat_log.append({"role": "user", "content": user_query})
         st.session_state.chat_log.append({"role": "assistant", "content": complete_response})
 
         # Display relevant documents
         with st.expander("Documents referenced for the answer"):
-            for doc in matched_docs:
-                st.write(f"- {doc}")
+            for passage in matched_docs:
+                st.write(f"- {passage['filename']} (page {passage.get('page', '?')})")
+            if context:
+                st.caption(
+                    f"Context: {context['tokens']} tokens used, {context['dropped_tokens']} tokens "
+                    f"dropped to fit the budget, {context['duplicates']} overlapping passages skipped"
+                )
+            if stage_timings:
+                st.caption("Timings: " + ", ".join(
+                    f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in stage_timings.items()
+                ))
+
+    # Show which version of the index answers questions
+    corpus = get_corpus()
+    st.sidebar.subheader("Index")
+    st.sidebar.write(f"Version {st.session_state.index_version}, updated {time.strftime('%H:%M:%S', time.localtime(st.session_state.live_index['updated_at']))}")
+    if corpus.reindexing:
+        done, total, pdf_file = corpus.progress
+        st.sidebar.caption(f"Re-indexing changed documents in the background ({done}/{total})...")
+    if corpus.reindex_error:
+        st.sidebar.caption(f"Last re-indexing failed: {corpus.reindex_error}")
+
+    # Show cache effectiveness in the sidebar
+    cache_stats = get_rag_cache().stats
+    st.sidebar.subheader("Cache")
+    st.sidebar.write(f"Answers: {cache_stats['answer_hits']} hits / {cache_stats['answer_misses']} misses")
+    st.sidebar.write(f"Queries: {cache_stats['query_hits']} hits / {cache_stats['query_misses']} misses")
+    similar_answers = get_similar_answer_cache()
+    st.sidebar.write(
+        f"Similar questions: {similar_answers.stats['hits']} hits / {similar_answers.stats['misses']} misses "
+        f"({similar_answers.hit_rate():.0%} hit rate)"
+    )
+    created_clients = client_metrics()
+    st.sidebar.caption(f"Clients created in this process: {created_clients['openai']} OpenAI, {created_clients['chroma']} Chroma")
 
 elif not st.session_state.is_system_ready:
     st.info("Please wait while the system is being set up...")
@@ -1,71 +1,103 @@
-import requests
 import streamlit as st
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
 
-# Set up OpenAI API Key
-client = OpenAI(api_key=st.secrets["openai_api_key"])
+from semantic_cache import SemanticCache, bucket
+from tracing import add_usage, span
+from weather import MAX_CONCURRENT_LOOKUPS, WeatherError, WeatherProvider
 
 # Page content
 st.title("Lab 5: Travel Weather and Suggestion Bot - Tanu Rana")
 
-# Function to get current weather
-def get_current_weather(location, API_key):
-    if not location:
-        location = "Syracuse, NY"  # Default location if none is provided
-    if "," in location:
-        location = location.split(",")[0].strip()
+# Function to get the process-wide weather provider (pooled session + TTL cache)
+@st.cache_resource
+def get_weather_provider(API_key):
+    return WeatherProvider(API_key)
 
-    urlbase = "https://api.openweathermap.org/data/2.5/"
-    urlweather = f"weather?q={location}&appid={API_key}"
-    url = urlbase + urlweather
-    response = requests.get(url)
-    data = response.json()
+# Suggestions are reused for the same city when the weather is about the same: temperatures
+# are bucketed by this many degrees and humidity by this many percent
+TEMPERATURE_BUCKET_DEGREES = 2
+HUMIDITY_BUCKET_PERCENT = 10
+SUGGESTION_CACHE_TTL_SECONDS = 60 * 60
+SUGGESTION_CACHE_MAX_ENTRIES = 1000
 
-    # Extract temperatures & Convert Kelvin to Celsius
-    temp = data['main']['temp'] - 273.15
-    feels_like = data['main']['feels_like'] - 273.15
-    temp_min = data['main']['temp_min'] - 273.15
-    temp_max = data['main']['temp_max'] - 273.15
-    humidity = data['main']['humidity']
+# Function to get the process-wide cache of clothing suggestions
+@st.cache_resource
+def get_suggestion_cache():
+    return SemanticCache(
+        max_entries=SUGGESTION_CACHE_MAX_ENTRIES,
+        ttl_seconds=SUGGESTION_CACHE_TTL_SECONDS,
+        name="suggestion_cache",
+        lab="lab5",
+    )
 
-    weather_info = {
-        "location": location,
-        "temperature": round(temp, 2),
-        "feels_like": round(feels_like, 2),
-        "temp_min": round(temp_min, 2),
-        "temp_max": round(temp_max, 2),
-        "humidity": round(humidity, 2)
-    }
-    return weather_info
+# Function to describe the weather by the features a suggestion depends on, bucketed
+def suggestion_scope(weather_info):
+    return (
+        " ".join(str(weather_info["location"]).lower().split()),
+        bucket(weather_info["temperature"], TEMPERATURE_BUCKET_DEGREES),
+        bucket(weather_info["feels_like"], TEMPERATURE_BUCKET_DEGREES),
+        bucket(weather_info["humidity"], HUMIDITY_BUCKET_PERCENT),
+    )
+
+# Function to get clothing suggestions based on weather using OpenAI's Chat API, reusing the
+# suggestion for similar weather in the same city when a cache is given
+def get_clothing_suggestions(client, weather_info, suggestion_cache=None):
+    if suggestion_cache is not None:
+        cached_suggestion = suggestion_cache.get(suggestion_scope(weather_info))
+        if cached_suggestion:
+            return cached_suggestion[0]
 
-# Function to get clothing suggestions based on weather using OpenAI's Chat API
-def get_clothing_suggestions(weather_info):
     prompt = f"The current weather in {weather_info['location']} is {weather_info['temperature']}°C, with a 'feels like' temperature of {weather_info['feels_like']}°C. The humidity is {weather_info['humidity']}%. Based on this, what kind of clothing would you suggest for someone traveling today?"
 
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",  # Specify model as per new API
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that gives weather-based clothing advice in one line.Provide clothing suggestions and advice on whether it’s a good day for a picnic."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=100
-    )
+    with span("clothing_suggestion", "lab5", "gpt-3.5-turbo") as attributes:
+        response = client.chat.completions.create(
+            model="gpt-3.5-turbo",  # Specify model as per new API
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant that gives weather-based clothing advice in one line.Provide clothing suggestions and advice on whether it’s a good day for a picnic."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=100
+        )
+        add_usage(attributes, response.usage)
     # Extract the text from the completion response
-    return response.choices[0].message.content.strip()
+    suggestion = response.choices[0].message.content.strip()
+    if suggestion_cache is not None:
+        suggestion_cache.put(suggestion_scope(weather_info), suggestion)
+    return suggestion
 
 # User input for location
 location = st.text_input("Enter a city (or leave blank for default 'Syracuse, NY'):")
 
-
+# Optional trip itinerary: every city is looked up concurrently
+itinerary = st.text_area("Planning a trip? Enter one city per line (optional):")
+trip_cities = [city.strip() for city in itinerary.splitlines() if city.strip()]
 
 # Get clothing suggestion  
 if st.button("Get Clothing Suggestion", key="clothing_button"):
-    weather_info = get_current_weather(location, st.secrets["weather_api_key"])
-    # st.write(f"Weather information for {weather_info['location']}:")
-    # st.write(f"Temperature: {weather_info['temperature']}°C")
-    # st.write(f"Feels Like: {weather_info['feels_like']}°C")
-    # st.write(f"Humidity: {weather_info['humidity']}%")
+    # This is the default page: the OpenAI SDK is only imported, and the client only looked
+    # up, once a suggestion is requested, so the first paint does not wait for them
+    from shared_clients import get_openai_client
+
+    client = get_openai_client(st.secrets["openai_api_key"])
+    weather_provider = get_weather_provider(st.secrets["weather_api_key"])
+    suggestion_cache = get_suggestion_cache()
+    cities = trip_cities or [location]
+    with span("weather_lookup", "lab5", cities=len(cities)):
+        weather_by_city = weather_provider.get_weather_for_cities(cities)
+    found_weather = {
+        city: weather_info
+        for city, weather_info in weather_by_city.items()
+        if not isinstance(weather_info, WeatherError)
+    }
+
+    # Fetch clothing suggestions for every city in parallel, at most MAX_CONCURRENT_LOOKUPS at a time
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENT_LOOKUPS, len(found_weather)))) as pool:
+        suggestions = dict(zip(found_weather, pool.map(lambda weather_info: get_clothing_suggestions(client, weather_info, suggestion_cache), found_weather.values())))
 
-    # Fetch clothing suggestions
-    suggestion = get_clothing_suggestions(weather_info)
-    st.write(f"Suggested clothing: {suggestion}")
+    for city, weather_info in weather_by_city.items():
+        if isinstance(weather_info, WeatherError):
+            st.error(str(weather_info))
+        elif len(cities) > 1:
+            st.write(f"**{weather_info['location']}** ({weather_info['temperature']}°C): {suggestions[city]}")
+        else:
+            st.write(f"Suggested clothing: {suggestions[city]}")
@@ -0,0 +1,54 @@
+"""Compare sequential (one request per text) and batched embedding throughput.
+
+Usage: python benchmarks/bench_embeddings.py [--texts 500] [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+
+from benchmarks.fake_openai import start_server
+from embeddings import EMBEDDING_MODEL, EmbeddingService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_server(latency=args.latency, rate_limit_probability=args.rate_limit_probability)
+    client = OpenAI(api_key="fake-key", base_url=server.base_url)
+    texts = [f"Passage {index} of the benchmark corpus. " * 40 for index in range(args.texts)]
+
+    # Sequential: what Lab4 used to do, one round-trip per text
+    start = time.perf_counter()
+    for text in texts:
+        client.embeddings.create(input=text, model=EMBEDDING_MODEL)
+    sequential_seconds = time.perf_counter() - start
+
+    # Batched: packed requests on a bounded worker pool
+    service = EmbeddingService(
+        client, max_inputs=args.batch_size, max_workers=args.workers, backoff_seconds=0.05
+    )
+    start = time.perf_counter()
+    vectors = service.embed(texts)
+    batched_seconds = time.perf_counter() - start
+    assert len(vectors) == len(texts) and all(vectors)
+
+    print(f"texts:      {len(texts)}")
+    print(f"sequential: {sequential_seconds:.2f}s  {len(texts) / sequential_seconds:.1f} texts/s  {len(texts)} requests")
+    print(f"batched:    {batched_seconds:.2f}s  {len(texts) / batched_seconds:.1f} texts/s  {service.request_count} requests")
+    print(f"speed-up:   {sequential_seconds / batched_seconds:.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
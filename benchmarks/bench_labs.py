@@ -0,0 +1,265 @@
+"""Headless load test of the lab code paths against the local fake OpenAI API.
+
+Scenarios:
+  lab1_qa       Lab 1 document QA: per-session index of the upload + two streamed answers
+  lab2_summary  Lab 2 summary: map-reduce for long documents + streamed summary
+  lab3_chat     Lab 3 chatbot: a few turns through ConversationMemory, streamed replies
+  lab4_ingest   Lab 4 ingestion of data_lab4 into a temporary store (run once)
+  lab4_query    Lab 4 hybrid retrieval + streamed answer through RagPipeline
+
+Every scenario except lab4_ingest runs --requests times on --concurrency threads. The report
+shows throughput, p50/p95 latency, errors and the peak resident memory of this process
+during the scenario (sampled; the fake API runs in the same process, PDF extraction worker
+processes are not included).
+
+Usage: python benchmarks/bench_labs.py [--concurrency 8] [--requests 40] [--latency 0.2]
+       [--tokens-per-second 50] [--scenarios lab1_qa lab4_query] [--json results.json]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from openai import AsyncOpenAI, OpenAI
+
+import tracing
+from benchmarks.fake_openai import start_server
+from bm25_index import BM25Index
+from conversation_memory import ConversationMemory
+from document_loader import iter_document_chunks
+from embeddings import EmbeddingService
+from ingestion import ingest_folder, ingestion_signature
+from pdf_extraction import extract_pdf_pages
+from rag_cache import RagCache
+from rag_pipeline import RagPipeline
+from session_index import build_document_index
+from summarizer import SECTION_SIZE, stream_sections_summary
+from vector_store import DEFAULT_STORE_CONFIG, open_vector_store
+
+SCENARIOS = ("lab1_qa", "lab2_summary", "lab3_chat", "lab4_ingest", "lab4_query")
+CHAT_TURNS = ("What is this course about?", "Who teaches it?", "How is it graded?", "Any prerequisites?")
+
+
+# Function to read the resident memory of this process in MB (peak RSS where /proc is missing)
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PeakMemory:
+    """Samples the resident memory on a background thread while the block runs."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+# Function to run `task(index)` `requests` times on `concurrency` threads and collect stats
+def run_load(task, requests, concurrency):
+    latencies = []
+    errors = []
+
+    def timed(index):
+        start = time.perf_counter()
+        try:
+            task(index)
+        except Exception as error:
+            errors.append(f"{type(error).__name__}: {error}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with PeakMemory() as memory, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(requests)))
+    wall_seconds = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": wall_seconds,
+        "throughput": requests / wall_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "peak_mb": memory.peak_mb,
+    }
+
+
+# Function to load the Lab 4 PDFs as plain text, used as the uploaded document for Lab 1-3
+def load_documents(pdf_folder):
+    documents = []
+    for name in sorted(os.listdir(pdf_folder)):
+        if name.endswith(".pdf"):
+            try:
+                documents.append("\n".join(extract_pdf_pages(os.path.join(pdf_folder, name))))
+            except Exception:
+                continue
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="*", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake API latency / time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="fake streaming rate per answer")
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--backend", choices=("flat", "chroma"), default="flat", help="Lab 4 vector store")
+    parser.add_argument("--pdf-folder", default=os.path.join(ROOT, "data_lab4"))
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Spans are still collected in memory, but not appended to traces.jsonl
+    tracing.TRACE_FILE = None
+
+    server = start_server(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+    )
+    client = OpenAI(api_key="fake-key", base_url=server.base_url)
+    documents = load_documents(args.pdf_folder)
+    if not documents:
+        parser.error(f"No readable PDFs in {args.pdf_folder}")
+
+    # Every request gets a distinct document so the in-process summary caches do not hide the work
+    def document_for(index):
+        return f"{documents[index % len(documents)]}\n\n(copy {index})"
+
+    async_client = AsyncOpenAI(api_key="fake-key", base_url=server.base_url)
+    lab1_cache = RagCache(":memory:")
+
+    def lab1_qa(index):
+        upload = io.BytesIO(document_for(index).encode("utf-8"))
+        upload.name = f"upload-{index}.txt"
+        document_index = build_document_index(
+            upload, f"upload-{index}", EmbeddingService(client, lab="lab1"), async_client, lab1_cache, "gpt-4o", 6, 4000
+        )
+        for question in ("What are the grading criteria?", "Who is the instructor?"):
+            "".join(document_index.pipeline.answer(question, "hybrid", document_index.fingerprint)["pieces"])
+
+    def lab2_summary(index):
+        upload = io.BytesIO(document_for(index).encode("utf-8"))
+        upload.name = f"upload-{index}.txt"
+        sections = (chunk["text"] for chunk in iter_document_chunks(upload, SECTION_SIZE, 0))
+        stream = stream_sections_summary(client, sections, "Summarize the document in 5 bullet points.", "gpt-4o-mini", lab="lab2")
+        "".join(tracing.trace_chat_stream(stream, "lab2", "gpt-4o-mini", name="summary"))
+
+    def lab3_chat(index):
+        memory = ConversationMemory(client, window_token_budget=200, lab="lab3")
+        for turn in CHAT_TURNS:
+            memory.add("user", f"{turn} ({index})")
+            stream = client.chat.completions.create(
+                model="gpt-4o-mini", messages=memory.context_messages(), stream=True, stream_options=tracing.STREAM_USAGE
+            )
+            memory.add("assistant", "".join(tracing.trace_chat_stream(stream, "lab3", "gpt-4o-mini")))
+
+    workdir = tempfile.mkdtemp(prefix="bench_labs_")
+    store_config = dict(DEFAULT_STORE_CONFIG, backend=args.backend)
+    db_path = os.path.join(workdir, "chroma_storage")
+    collection = open_vector_store(db_path, "DocumentLabCollection", store_config)
+    bm25_index = BM25Index()
+
+    def lab4_ingest():
+        start = time.perf_counter()
+        with PeakMemory() as memory:
+            result = ingest_folder(
+                args.pdf_folder, db_path, collection, bm25_index, EmbeddingService(client, lab="lab4"),
+                1500, 200, signature=ingestion_signature(1500, 200, store_config),
+            )
+        seconds = time.perf_counter() - start
+        return {
+            "requests": len(result["changed"]),
+            "concurrency": 1,
+            "seconds": seconds,
+            "throughput": len(result["changed"]) / seconds,
+            "p50_ms": seconds * 1000,
+            "p95_ms": seconds * 1000,
+            "errors": len(result["errors"]),
+            "first_error": next(iter(result["errors"].values()), None),
+            "peak_mb": memory.peak_mb,
+        }
+
+    with open(os.path.join(ROOT, "benchmarks", "retrieval_queries.json"), "r", encoding="utf-8") as file:
+        queries = [item["query"] for item in json.load(file)]
+    pipeline = None
+
+    def lab4_query(index):
+        turn = pipeline.answer(f"{queries[index % len(queries)]} ({index})", "hybrid", "bench")
+        "".join(turn["pieces"])
+
+    results = {}
+    try:
+        for scenario in args.scenarios:
+            if scenario == "lab4_ingest":
+                results[scenario] = lab4_ingest()
+                continue
+            if scenario == "lab4_query":
+                if not collection.count():
+                    lab4_ingest()
+                pipeline = RagPipeline(
+                    async_client,
+                    collection,
+                    bm25_index,
+                    RagCache(os.path.join(workdir, "rag_cache.sqlite3")),
+                    "gpt-4o",
+                    5,
+                    3000,
+                )
+            task = {"lab1_qa": lab1_qa, "lab2_summary": lab2_summary, "lab3_chat": lab3_chat, "lab4_query": lab4_query}[scenario]
+            results[scenario] = run_load(task, args.requests, args.concurrency)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'scenario':<14} {'requests':>8} {'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7} {'peak MB':>8}")
+    for scenario, result in results.items():
+        print(
+            f"{scenario:<14} {result['requests']:>8} {result['concurrency']:>5} {result['throughput']:>8.2f} "
+            f"{result['p50_ms']:>9.0f} {result['p95_ms']:>9.0f} {result['errors']:>7} {result['peak_mb']:>8.1f}"
+        )
+        if result["first_error"]:
+            print(f"  first error: {result['first_error']}")
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"fake API calls: {server.counters}")
+    print(f"process peak RSS: {max_rss_mb:.0f} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"settings": vars(args), "results": results, "max_rss_mb": max_rss_mb}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Recall and latency of the vector store options against exact float32 search.
+
+Compares the flat NumPy index (float32, int8, reduced dimensions) and, when chromadb is
+installed, Chroma HNSW with several M / ef_construction / ef_search settings. Uses clustered
+synthetic unit vectors unless --embeddings points at an .npy file of real embeddings
+(rows = vectors), e.g. dumped from DocumentLabCollection.
+
+Usage: python benchmarks/bench_vector_store.py [--vectors 20000] [--queries 200] [--k 10]
+       [--chunks-per-document 20]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_store import FlatVectorStore, flush_vector_store, open_vector_store, truncate_embeddings
+
+HNSW_SETTINGS = [
+    # (M, ef_construction, ef_search)
+    (16, 100, 10),
+    (16, 100, 50),
+    (32, 200, 100),
+]
+
+
+# Function to generate clustered unit vectors that look a little like document embeddings
+def synthetic_vectors(count, dimensions, clusters=200, seed=0):
+    generator = np.random.default_rng(seed)
+    centers = generator.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centers[generator.integers(0, clusters, count)] + 0.6 * generator.standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+# Function to compute the exact top-k ids for every query
+def exact_top_k(vectors, queries, k):
+    similarities = queries @ vectors.T
+    return [set(np.argsort(-row)[:k]) for row in similarities]
+
+
+# Function to run every query and return (recall@k, p50 ms, p95 ms)
+def measure(store, queries, truth, k, transform=None):
+    latencies = []
+    recalled = 0
+    for query, expected in zip(queries, truth):
+        query = transform(query[None, :])[0] if transform else query
+        start = time.perf_counter()
+        result = store.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalled += len({int(doc_id) for doc_id in result["ids"][0]} & expected)
+    return recalled / (k * len(queries)), np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+# Function to load vectors into a store one document (`batch_size` chunks) at a time, the
+# way ingest_folder does, then write it to disk
+def fill(store, vectors, batch_size):
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        store.upsert(
+            ids=[str(index) for index in range(start, start + len(batch))],
+            embeddings=batch.tolist(),
+        )
+    flush_vector_store(store)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--chunks-per-document", type=int, default=20, help="vectors upserted per call")
+    parser.add_argument("--reduced-dimensions", type=int, nargs="*", default=[512, 256])
+    parser.add_argument("--embeddings", help="optional .npy file with real embeddings")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dimensions)
+    # Queries are perturbed copies of stored vectors, like paraphrased questions
+    generator = np.random.default_rng(1)
+    queries = vectors[generator.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.3 * generator.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_vector_store_")
+    rows = []
+    try:
+        configurations = [("flat float32", "none", None), ("flat int8", "int8", None)]
+        configurations += [(f"flat float32 {d}d", "none", d) for d in args.reduced_dimensions]
+        configurations += [(f"flat int8 {d}d", "int8", d) for d in args.reduced_dimensions]
+        for label, quantization, dimensions in configurations:
+            store = FlatVectorStore(work_dir, label.replace(" ", "_"), quantization, dimensions)
+            stored = truncate_embeddings(vectors, dimensions) if dimensions else vectors
+            start = time.perf_counter()
+            fill(store, stored, args.chunks_per_document)
+            build_seconds = time.perf_counter() - start
+            transform = (lambda q, d=dimensions: truncate_embeddings(q, d)) if dimensions else None
+            bytes_per_vector = stored.shape[1] * (1 if quantization == "int8" else 4)
+            rows.append((label, build_seconds, bytes_per_vector, *measure(store, queries, truth, args.k, transform)))
+
+        try:
+            import chromadb  # noqa: F401
+        except ImportError:
+            print("chromadb is not installed; skipping the HNSW configurations")
+        else:
+            for m, ef_construction, ef_search in HNSW_SETTINGS:
+                label = f"chroma M={m} efC={ef_construction} efS={ef_search}"
+                store = open_vector_store(os.path.join(work_dir, "chroma"), f"bench_{m}_{ef_construction}_{ef_search}", {
+                    "backend": "chroma",
+                    "hnsw_m": m,
+                    "hnsw_ef_construction": ef_construction,
+                    "hnsw_ef_search": ef_search,
+                })
+                start = time.perf_counter()
+                fill(store, vectors, args.chunks_per_document)
+                build_seconds = time.perf_counter() - start
+                rows.append((label, build_seconds, vectors.shape[1] * 4, *measure(store, queries, truth, args.k)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, recall@{args.k} vs exact float32")
+    print(f"{'configuration':<34} {'build s':>8} {'bytes/vec':>10} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7}")
+    for label, build_seconds, bytes_per_vector, recall, p50, p95 in rows:
+        print(f"{label:<34} {build_seconds:>8.2f} {bytes_per_vector:>10} {recall:>7.3f} {p50:>7.2f} {p95:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Exercise WeatherProvider against the local weather stub.
+
+Shows a sequential itinerary lookup, the same lookup run concurrently, a fully cached
+repeat, and how the error responses without a "main" section are reported.
+
+Usage: python benchmarks/bench_weather.py [--latency 0.1]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_weather import start_server
+from weather import WeatherError, WeatherProvider
+
+ITINERARY = ["Syracuse, NY", "Boston", "New York", "Chicago", "Denver", "Seattle", "Austin", "Miami"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    server = start_server(latency=args.latency)
+
+    # Sequential, uncached: one blocking request after another
+    provider = WeatherProvider("stub-key", base_url=server.base_url, ttl_seconds=0)
+    start = time.perf_counter()
+    for city in ITINERARY:
+        provider.get_current_weather(city)
+    print(f"sequential: {time.perf_counter() - start:.2f}s for {len(ITINERARY)} cities")
+
+    # Concurrent, then the same itinerary again from the cache
+    provider = WeatherProvider("stub-key", base_url=server.base_url)
+    start = time.perf_counter()
+    results = provider.get_weather_for_cities(ITINERARY)
+    print(f"concurrent: {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    provider.get_weather_for_cities(ITINERARY)
+    print(f"cached:     {time.perf_counter() - start:.4f}s  stats={provider.stats}")
+    assert all(not isinstance(result, WeatherError) for result in results.values())
+
+    # Error responses without a "main" section are reported, not crashed on
+    for city in ("nowhere", "ratelimited"):
+        try:
+            provider.get_current_weather(city)
+            raise AssertionError(f"{city} should have failed")
+        except WeatherError as error:
+            print(f"{city}: {error}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
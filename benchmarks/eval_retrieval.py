@@ -0,0 +1,90 @@
+"""Measure recall@k of vector-only, BM25-only and hybrid retrieval on the data_lab4 syllabi.
+
+Each labelled query lists the files that answer it; a query counts as recalled when one of
+the top-k passages comes from one of those files. The vector and hybrid modes need an
+OpenAI key in OPENAI_API_KEY (OPENAI_BASE_URL may point at another endpoint).
+
+Usage: python benchmarks/eval_retrieval.py [--k 5] [--modes vector bm25 hybrid]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from chunking import chunk_pages
+from document_index import list_pdf_files
+from pdf_extraction import iter_extracted_pdfs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_queries.json")
+
+
+# Function to chunk every PDF in the folder, returning {chunk_id: chunk}
+def load_chunks(pdf_folder):
+    pdf_paths = [os.path.join(pdf_folder, name) for name in list_pdf_files(pdf_folder)]
+    chunks = {}
+    for result in iter_extracted_pdfs(pdf_paths):
+        if result["error"]:
+            print(f"skipping {result['path']}: {result['error']}", file=sys.stderr)
+            continue
+        pdf_file = os.path.basename(result["path"])
+        for chunk in chunk_pages(result["pages"]):
+            chunks[f"{pdf_file}#{chunk['chunk_index']}"] = dict(chunk, filename=pdf_file)
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["vector", "bm25", "hybrid"])
+    parser.add_argument("--pdf-folder", default=os.path.join(ROOT, "data_lab4"))
+    args = parser.parse_args()
+
+    with open(QUERIES_FILE, "r", encoding="utf-8") as file:
+        labelled_queries = json.load(file)
+    chunks = load_chunks(args.pdf_folder)
+    chunk_ids = list(chunks)
+
+    bm25_index = BM25Index()
+    for chunk_id in chunk_ids:
+        bm25_index.add(chunk_id, chunks[chunk_id]["text"], {"filename": chunks[chunk_id]["filename"]})
+
+    vector_rankings = {}
+    if {"vector", "hybrid"} & set(args.modes):
+        import numpy as np
+
+        from embeddings import EmbeddingService
+        from shared_clients import get_openai_client
+
+        service = EmbeddingService(get_openai_client(os.environ["OPENAI_API_KEY"]))
+        chunk_matrix = np.array(service.embed([chunks[chunk_id]["text"] for chunk_id in chunk_ids]))
+        query_matrix = np.array(service.embed([item["query"] for item in labelled_queries]))
+        # Exact cosine search (OpenAI embeddings are unit length)
+        similarities = query_matrix @ chunk_matrix.T
+        for item, row in zip(labelled_queries, similarities):
+            vector_rankings[item["query"]] = [chunk_ids[i] for i in np.argsort(-row)[: args.k]]
+
+    print(f"{len(labelled_queries)} queries, {len(chunks)} chunks, k={args.k}")
+    for mode in args.modes:
+        recalled = 0
+        start = time.perf_counter()
+        for item in labelled_queries:
+            rankings = []
+            if mode in ("bm25", "hybrid"):
+                rankings.append([doc_id for doc_id, _ in bm25_index.search(item["query"], args.k)])
+            if mode in ("vector", "hybrid"):
+                rankings.append(vector_rankings[item["query"]])
+            top_ids = reciprocal_rank_fusion(rankings)[: args.k]
+            if any(chunks[doc_id]["filename"] in item["relevant"] for doc_id in top_ids):
+                recalled += 1
+        # Vector timings exclude the embedding round-trips, which were batched up front
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(labelled_queries)
+        print(f"{mode:>7}: recall@{args.k} = {recalled / len(labelled_queries):.2f}  ({elapsed_ms:.2f} ms/query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""A local stand-in for the OpenAI API, used to benchmark the labs without spending money.
+
+Serves embeddings, chat completions (plain and streamed) and the model list. `latency` is
+added before every response (for streams: before the first token) and streamed answers are
+sent at `tokens_per_second`.
+
+Run it with `python benchmarks/fake_openai.py --port 8765` and point an OpenAI client at
+`http://127.0.0.1:8765/v1` with any API key.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIMENSIONS = 1536
+MODEL_IDS = ("gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo", "text-embedding-3-small")
+COMPLETION_WORDS = (
+    "the", "document", "says", "that", "students", "should", "review", "each", "week",
+    "and", "submit", "their", "work", "on", "time", "according", "to", "syllabus",
+)
+
+
+# Function to build a deterministic unit vector for a text, so equal texts embed equally
+def fake_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    values = []
+    counter = 0
+    while len(values) < dimensions:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend((byte - 127.5) / 127.5 for byte in digest)
+        counter += 1
+    values = values[:dimensions]
+    norm = sum(value * value for value in values) ** 0.5 or 1.0
+    return [value / norm for value in values]
+
+
+# Function to estimate the prompt tokens of a chat request (about 4 characters per token)
+def count_prompt_tokens(messages):
+    return sum(len(str(message.get("content") or "")) // 4 + 1 for message in messages)
+
+
+# Function to build a deterministic answer of `tokens` words for a prompt
+def fake_completion_words(messages, tokens):
+    seed = int(hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()[:8], 16)
+    return [COMPLETION_WORDS[(seed + index) % len(COMPLETION_WORDS)] for index in range(tokens)]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # Settings are stored on the server object, see `start_server`
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _maybe_rate_limit(self):
+        if self.server.take_forced_rate_limit() or random.random() < self.server.rate_limit_probability:
+            self.server.record("rate_limited")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", "0")
+            body = json.dumps({"error": {"message": "Rate limit reached", "type": "rate_limit"}}).encode("utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path.endswith("/models"):
+            self.server.record("models")
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": model, "object": "model", "created": 0, "owned_by": "fake"} for model in MODEL_IDS],
+            })
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _send_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _chat_completion(self):
+        self.server.record("chat")
+        payload = self._read_json()
+        if self._maybe_rate_limit():
+            return
+        messages = payload.get("messages") or []
+        completion_tokens = min(self.server.completion_tokens, payload.get("max_tokens") or self.server.completion_tokens)
+        words = fake_completion_words(messages, completion_tokens)
+        usage = {
+            "prompt_tokens": count_prompt_tokens(messages),
+            "completion_tokens": completion_tokens,
+            "total_tokens": count_prompt_tokens(messages) + completion_tokens,
+        }
+        common = {"id": "chatcmpl-fake", "created": int(time.time()), "model": payload.get("model")}
+        time.sleep(self.server.latency)
+
+        if not payload.get("stream"):
+            self._send_json(200, dict(
+                common,
+                object="chat.completion",
+                choices=[{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop",
+                }],
+                usage=usage,
+            ))
+            return
+
+        # Server-sent events, one word per chunk, paced at `tokens_per_second`
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        chunk = dict(common, object="chat.completion.chunk")
+        delay = 1.0 / self.server.tokens_per_second if self.server.tokens_per_second else 0.0
+        for index, word in enumerate(words):
+            delta = {"content": word if index == 0 else " " + word}
+            if index == 0:
+                delta["role"] = "assistant"
+            self._send_event(dict(chunk, choices=[{"index": 0, "delta": delta, "finish_reason": None}]))
+            if delay:
+                time.sleep(delay)
+        self._send_event(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            self._send_event(dict(chunk, choices=[], usage=usage))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        if self.path.endswith("/chat/completions"):
+            self._chat_completion()
+        elif self.path.endswith("/embeddings"):
+            self.server.record("embeddings")
+            payload = self._read_json()
+            if self._maybe_rate_limit():
+                return
+            inputs = payload.get("input")
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            time.sleep(self.server.latency)
+            data = []
+            for index, text in enumerate(inputs):
+                vector = fake_embedding(text)
+                if payload.get("encoding_format") == "base64":
+                    vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+                data.append({"object": "embedding", "index": index, "embedding": vector})
+            tokens = sum(len(text) // 4 + 1 for text in inputs)
+            self._send_json(200, {
+                "object": "list",
+                "data": data,
+                "model": payload.get("model"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.05, rate_limit_probability=0.0, tokens_per_second=200.0, completion_tokens=64):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.rate_limit_probability = rate_limit_probability
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.counters = {}
+        self.forced_rate_limits = 0  # the next this many requests are rate limited (for tests)
+        self._lock = threading.Lock()
+
+    def record(self, name):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def take_forced_rate_limit(self):
+        with self._lock:
+            if self.forced_rate_limits <= 0:
+                return False
+            self.forced_rate_limits -= 1
+            return True
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+# Function to start the fake server on a background thread (port 0 picks a free port)
+def start_server(port=0, **settings):
+    server = FakeOpenAIServer(("127.0.0.1", port), **settings)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every request")
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="pace of streamed answers (0: no delay)")
+    parser.add_argument("--completion-tokens", type=int, default=64, help="length of every answer")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(
+        ("127.0.0.1", args.port),
+        latency=args.latency,
+        rate_limit_probability=args.rate_limit_probability,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+    )
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    server.serve_forever()
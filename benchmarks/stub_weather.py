@@ -0,0 +1,91 @@
+"""A local stand-in for the OpenWeatherMap current weather endpoint.
+
+Known cities return a normal payload; "nowhere" returns the 404 "city not found" error and
+"ratelimited" the 429 error, both of which have no "main" section. Any other city gets a
+temperature derived from its name. Point WeatherProvider at `server.base_url`.
+"""
+import argparse
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ERROR_RESPONSES = {
+    "nowhere": (404, {"cod": "404", "message": "city not found"}),
+    "ratelimited": (429, {"cod": 429, "message": "Your account is temporary blocked due to exceeding of requests limitation"}),
+}
+
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        city = parse_qs(url.query).get("q", [""])[0].strip().lower()
+        self.server.record(city)
+        time.sleep(self.server.latency)
+
+        if not url.path.endswith("/weather"):
+            status, payload = 404, {"cod": "404", "message": "Internal error"}
+        elif city in ERROR_RESPONSES:
+            status, payload = ERROR_RESPONSES[city]
+        else:
+            # Deterministic temperature between -10 and 30 degrees Celsius
+            kelvin = 263.15 + zlib.crc32(city.encode("utf-8")) % 40
+            status, payload = 200, {
+                "name": city.title(),
+                "cod": 200,
+                "main": {
+                    "temp": kelvin,
+                    "feels_like": kelvin - 1.5,
+                    "temp_min": kelvin - 3,
+                    "temp_max": kelvin + 3,
+                    "humidity": 40 + zlib.crc32(city.encode("utf-8")) % 50,
+                },
+            }
+
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubWeatherServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.1):
+        super().__init__(address, StubWeatherHandler)
+        self.latency = latency
+        self.requests_by_city = {}
+        self._lock = threading.Lock()
+
+    def record(self, city):
+        with self._lock:
+            self.requests_by_city[city] = self.requests_by_city.get(city, 0) + 1
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/data/2.5/weather"
+
+
+# Function to start the stub on a background thread (port 0 picks a free port)
+def start_server(port=0, **settings):
+    server = StubWeatherServer(("127.0.0.1", port), **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    server = StubWeatherServer(("127.0.0.1", args.port), latency=args.latency)
+    print(f"Stub weather API listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,137 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+# Name of the BM25 index file stored next to the ChromaDB files
+BM25_FILENAME = "bm25_index.json"
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Constant used by reciprocal rank fusion; 60 is the value from the original RRF paper
+RRF_K = 60
+
+
+# Function to split text into lowercase terms. A word directly followed by a number is also
+# indexed as one term, so "IST 652" and "IST652" match each other.
+def tokenize(text):
+    words = re.findall(r"[a-z]+|\d+", text.lower())
+    terms = list(words)
+    for first, second in zip(words, words[1:]):
+        if first.isalpha() and second.isdigit():
+            terms.append(first + second)
+    return terms
+
+
+class BM25Index:
+    """In-process inverted index with BM25 scoring over the Lab 4 chunks."""
+
+    def __init__(self):
+        self.postings = {}  # term -> {doc_id: term frequency}
+        self.doc_lengths = {}  # doc_id -> number of terms
+        self.doc_metadata = {}  # doc_id -> chunk metadata
+        self.doc_terms = {}  # doc_id -> distinct terms, so removals only touch their own postings
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    # Function to add (or replace) one chunk in the index
+    def add(self, doc_id, text, metadata=None):
+        with self._lock:
+            self.remove(doc_id)
+            terms = tokenize(text)
+            term_counts = Counter(terms)
+            for term, count in term_counts.items():
+                self.postings.setdefault(term, {})[doc_id] = count
+            self.doc_terms[doc_id] = list(term_counts)
+            self.doc_lengths[doc_id] = len(terms)
+            self.doc_metadata[doc_id] = metadata or {}
+            self.total_length += len(terms)
+
+    # Function to remove one chunk from the index
+    def remove(self, doc_id):
+        with self._lock:
+            if doc_id not in self.doc_lengths:
+                return
+            for term in self.doc_terms.pop(doc_id, []):
+                term_postings = self.postings.get(term, {})
+                term_postings.pop(doc_id, None)
+                if not term_postings:
+                    self.postings.pop(term, None)
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            self.doc_metadata.pop(doc_id, None)
+
+    # Function to remove every chunk that belongs to a file
+    def remove_file(self, filename):
+        with self._lock:
+            for doc_id, metadata in list(self.doc_metadata.items()):
+                if metadata.get("filename") == filename:
+                    self.remove(doc_id)
+
+    # Function to return the ids of the best matching chunks as (doc_id, score) pairs
+    def search(self, query, top_k=5):
+        with self._lock:
+            if not self.doc_lengths:
+                return []
+            doc_count = len(self.doc_lengths)
+            average_length = self.total_length / doc_count or 1
+            scores = {}
+            for term in set(tokenize(query)):
+                term_postings = self.postings.get(term)
+                if not term_postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+                for doc_id, frequency in term_postings.items():
+                    length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / average_length
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (
+                        frequency + BM25_K1 * length_norm
+                    )
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    # Function to save the index as JSON, atomically
+    def save(self, path):
+        with self._lock:
+            data = {
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+                "doc_metadata": self.doc_metadata,
+            }
+            temp_path = path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(temp_path, path)
+
+    # Function to load an index saved with `save`; returns an empty index if there is none
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return index
+        index.postings = data["postings"]
+        index.doc_lengths = data["doc_lengths"]
+        index.doc_metadata = data["doc_metadata"]
+        index.total_length = sum(index.doc_lengths.values())
+        for term, term_postings in index.postings.items():
+            for doc_id in term_postings:
+                index.doc_terms.setdefault(doc_id, []).append(term)
+        return index
+
+
+# Function to merge several rankings (lists of ids, best first) with reciprocal rank fusion
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
@@ -0,0 +1,90 @@
+import bisect
+
+# Default chunking settings for the Lab 4 document collection (in characters)
+DEFAULT_CHUNK_SIZE = 1500
+DEFAULT_CHUNK_OVERLAP = 200
+
+
+# Function to roughly estimate the number of tokens in a text (~4 characters per token)
+def estimate_tokens(text):
+    return max(1, len(text) // 4) if text else 0
+
+
+# Function to split a document into overlapping chunks.
+# `pages` is a list of page texts; every chunk keeps the page it starts on, the page it
+# ends on and its character offsets in the concatenated document.
+def chunk_pages(pages, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_CHUNK_OVERLAP):
+    return list(iter_chunks(enumerate(pages, start=1), chunk_size, overlap))
+
+
+# Function to chunk a document that arrives in pieces, yielding each chunk as soon as the
+# text after it has been read. `pieces` is an iterable of (page number, text) pairs, in
+# order; a page may arrive in several pieces. Only the text of the chunk being built is
+# kept in memory, so arbitrarily large documents can be chunked. Chunks are the same as
+# `chunk_pages` would produce for the concatenated pages.
+def iter_chunks(pieces, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_CHUNK_OVERLAP):
+    if overlap >= chunk_size:
+        raise ValueError("Chunk overlap must be smaller than the chunk size.")
+
+    buffer = ""  # text from offset `buffer_start` onwards
+    buffer_start = 0
+    page_offsets = []  # offsets where each page starts, with the matching page numbers
+    page_numbers = []
+    start = 0
+    chunk_index = 0
+
+    def page_at(offset):
+        position = bisect.bisect_right(page_offsets, offset)
+        return page_numbers[position - 1] if position else 1
+
+    def make_chunk(end, is_last):
+        # Prefer to break on whitespace so words are not cut in half
+        if not is_last:
+            split_at = buffer.rfind(" ", start + overlap + 1 - buffer_start, end - buffer_start)
+            if split_at != -1:
+                end = split_at + buffer_start
+        chunk_text = buffer[start - buffer_start:end - buffer_start].strip()
+        chunk = None
+        if chunk_text:
+            chunk = {
+                "text": chunk_text,
+                "page": page_at(start),
+                "page_end": page_at(end - 1),
+                "start_offset": start,
+                "end_offset": end,
+                "chunk_index": chunk_index,
+            }
+        return chunk, end
+
+    for page, piece in pieces:
+        if not page_numbers or page_numbers[-1] != page:
+            if page_offsets and page_offsets[-1] == buffer_start + len(buffer):
+                # The previous page was empty: the new page starts at the same offset
+                page_numbers[-1] = page
+            else:
+                page_offsets.append(buffer_start + len(buffer))
+                page_numbers.append(page)
+        buffer += piece
+        # Emit every chunk that has text after it; the last one waits for the end of input
+        while buffer_start + len(buffer) > start + chunk_size:
+            chunk, end = make_chunk(start + chunk_size, False)
+            if chunk:
+                chunk_index += 1
+                yield chunk
+            start = end - overlap
+            # Forget the text (and pages) before the next chunk
+            buffer = buffer[start - buffer_start:]
+            buffer_start = start
+            keep_from = max(0, bisect.bisect_right(page_offsets, start) - 1)
+            del page_offsets[:keep_from], page_numbers[:keep_from]
+
+    total_length = buffer_start + len(buffer)
+    while start < total_length:
+        end = min(start + chunk_size, total_length)
+        chunk, end = make_chunk(end, end >= total_length)
+        if chunk:
+            chunk_index += 1
+            yield chunk
+        if end >= total_length:
+            break
+        start = end - overlap
@@ -0,0 +1,117 @@
+from chunking import estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:  # fall back to the character-based estimate
+    tiktoken = None
+
+# Context windows of the chat models used by the labs (in tokens)
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+    "gpt-3.5-turbo": 16_385,
+}
+DEFAULT_CONTEXT_WINDOW = 16_385
+
+# Tokens kept free for the instructions, the question and the model's answer
+RESPONSE_TOKEN_RESERVE = 4_096
+
+# Passages from the same file overlapping by more than this share are duplicates
+DUPLICATE_OVERLAP_RATIO = 0.5
+
+_encodings = {}
+
+
+# Function to get the tokenizer for a model (cached; None when tiktoken is unavailable)
+def _get_encoding(model):
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # The encoding files could not be downloaded; estimate instead
+            _encodings[model] = None
+    return _encodings[model]
+
+
+# Function to count the tokens of a text locally for the given model
+def count_tokens(text, model="gpt-4o"):
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# Function to cut a text to at most `max_tokens` tokens of the given model
+def truncate_tokens(text, max_tokens, model="gpt-4o"):
+    # A token covers at least one byte, so short texts need no tokenizing
+    if len(text.encode("utf-8")) <= max_tokens:
+        return text
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:max_tokens]) if len(tokens) > max_tokens else text
+
+
+# Function to get the largest context a model can take while leaving room for the answer
+def context_budget(model, max_tokens=None):
+    budget = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW) - RESPONSE_TOKEN_RESERVE
+    return min(budget, max_tokens) if max_tokens else budget
+
+
+# Function to check whether a passage repeats one that was already kept
+def _is_duplicate(passage, kept_passages):
+    for kept in kept_passages:
+        if passage["text"] == kept["text"]:
+            return True
+        if passage.get("filename") != kept.get("filename") or "start_offset" not in passage:
+            continue
+        overlap = min(passage["end_offset"], kept["end_offset"]) - max(passage["start_offset"], kept["start_offset"])
+        shortest = min(
+            passage["end_offset"] - passage["start_offset"], kept["end_offset"] - kept["start_offset"]
+        )
+        if shortest > 0 and overlap / shortest > DUPLICATE_OVERLAP_RATIO:
+            return True
+    return False
+
+
+# Function to assemble prompt context from passages ranked by relevance (best first).
+# Passages are added until the token budget is full; duplicates and overlapping passages are
+# skipped.
+# Returns a dict with the context "text", the kept "passages", the "tokens" used and the
+# "dropped_tokens"/"dropped_passages" that did not fit.
+def build_context(passages, model="gpt-4o", budget=None, separator="\n\n"):
+    budget = budget or context_budget(model)
+    separator_tokens = count_tokens(separator, model)
+    kept_passages = []
+    used_tokens = 0
+    dropped_tokens = 0
+    dropped_passages = 0
+    duplicates = 0
+
+    for passage in passages:
+        if _is_duplicate(passage, kept_passages):
+            duplicates += 1
+            continue
+        passage_tokens = count_tokens(passage["text"], model)
+        cost = passage_tokens + (separator_tokens if kept_passages else 0)
+        if used_tokens + cost > budget:
+            dropped_tokens += passage_tokens
+            dropped_passages += 1
+            continue
+        kept_passages.append(dict(passage, tokens=passage_tokens))
+        used_tokens += cost
+
+    return {
+        "text": separator.join(passage["text"] for passage in kept_passages),
+        "passages": kept_passages,
+        "tokens": used_tokens,
+        "dropped_tokens": dropped_tokens,
+        "dropped_passages": dropped_passages,
+        "duplicates": duplicates,
+    }
+
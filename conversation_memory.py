@@ -0,0 +1,111 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from context_builder import count_tokens
+from tracing import add_usage, span
+
+# Cheaper model that keeps the rolling summary up to date
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_MAX_TOKENS = 300
+
+# Token budget for the recent turns sent verbatim with every request
+WINDOW_TOKEN_BUDGET = 2000
+
+SUMMARY_PROMPT = (
+    "You maintain the memory of a conversation between a user and an assistant.\n\n"
+    "Current summary of the earlier conversation:\n{summary}\n\n"
+    "Newer turns to fold into the summary:\n{turns}\n\n"
+    "Write an updated summary in at most {max_words} words. Keep facts, names, decisions "
+    "and open questions the assistant may need later."
+)
+
+# Background summarization is shared by every session in the process
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-memory")
+
+
+class ConversationMemory:
+    """Chat memory made of a rolling summary of older turns plus a verbatim recent window.
+
+    Every prompt is bounded by SUMMARY_MAX_TOKENS + `window_token_budget`, however long the
+    conversation gets. Turns that slide out of the window are folded into the summary in
+    the background, so the chat never waits for it (until a refresh lands, the turns that
+    just left the window are missing from the prompt).
+    """
+
+    def __init__(self, client, model=SUMMARY_MODEL, window_token_budget=WINDOW_TOKEN_BUDGET, lab=None):
+        self.client = client
+        self.lab = lab
+        self.model = model
+        self.window_token_budget = window_token_budget
+        self.messages = []  # every turn, for display
+        self.summary = ""
+        self.summarized_count = 0  # messages[:summarized_count] are covered by the summary
+        self._pending = None
+        self._lock = threading.Lock()
+
+    # Function to record a turn and start a summary refresh if turns left the window
+    def add(self, role, content):
+        with self._lock:
+            self.messages.append({"role": role, "content": content})
+        self._refresh_summary()
+
+    # Function to find where the verbatim window starts (the newest turns within budget)
+    def _window_start(self):
+        used_tokens = 0
+        start = len(self.messages)
+        while start > 0:
+            message_tokens = count_tokens(self.messages[start - 1]["content"], self.model)
+            # Always keep the latest turn, even when it alone is over budget
+            if start < len(self.messages) and used_tokens + message_tokens > self.window_token_budget:
+                break
+            used_tokens += message_tokens
+            start -= 1
+        return start
+
+    # Function to build the messages to send: the summary (if any) and the recent window
+    def context_messages(self):
+        with self._lock:
+            window_start = max(self._window_start(), self.summarized_count)
+            context = []
+            if self.summary:
+                context.append({
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation: {self.summary}",
+                })
+            context.extend(self.messages[window_start:])
+            return context
+
+    def _refresh_summary(self):
+        with self._lock:
+            window_start = self._window_start()
+            if self._pending is not None or window_start <= self.summarized_count:
+                return
+            turns = self.messages[self.summarized_count:window_start]
+            previous_summary = self.summary
+            self._pending = _executor.submit(self._summarize, previous_summary, turns, window_start)
+
+    def _summarize(self, previous_summary, turns, summarized_until):
+        try:
+            transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+            with span("memory_summary", self.lab, self.model) as attributes:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{
+                        "role": "user",
+                        "content": SUMMARY_PROMPT.format(
+                            summary=previous_summary or "(none yet)",
+                            turns=transcript,
+                            max_words=SUMMARY_MAX_TOKENS * 3 // 4,
+                        ),
+                    }],
+                    max_tokens=SUMMARY_MAX_TOKENS,
+                )
+                add_usage(attributes, response.usage)
+            with self._lock:
+                self.summary = response.choices[0].message.content.strip()
+                self.summarized_count = summarized_until
+        finally:
+            with self._lock:
+                self._pending = None
+        # More turns may have left the window while this summary was being written
+        self._refresh_summary()
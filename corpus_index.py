@@ -0,0 +1,349 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+from document_index import list_pdf_files
+from tracing import record_span
+
+# Lab 4 corpus: the PDFs to index and where the index is stored
+PDF_FOLDER = os.path.join(os.getcwd(), "data_lab4")
+DB_PATH = os.path.join(os.getcwd(), "chroma_storage")
+COLLECTION_NAME = "DocumentLabCollection"
+
+# Chunking settings for the document collection
+CHUNK_SIZE = 1500  # characters per chunk
+CHUNK_OVERLAP = 200  # characters shared by consecutive chunks
+
+# Vector store settings, on top of vector_store.DEFAULT_STORE_CONFIG: "backend" is "chroma"
+# (HNSW) or "flat" (exact NumPy search, for small corpora), "hnsw_*" tune Chroma, `dimensions`
+# shortens the embeddings and `quantization` ("none"/"int8") applies to "flat"; see
+# benchmarks/bench_vector_store.py for the recall/latency trade-offs. Changing the HNSW
+# settings rebuilds the collection's graph; changing `dimensions` re-embeds the corpus.
+VECTOR_STORE_CONFIG = {"backend": "chroma"}
+
+# Re-indexing: each rebuild goes into a new folder under GENERATIONS_FOLDER, and
+# LIVE_INDEX_FILENAME names the one being served (without it, DB_PATH itself is served)
+GENERATIONS_FOLDER = "generations"
+LIVE_INDEX_FILENAME = "live_index.json"
+
+# How often the watcher checks the PDF folder, and how long it waits after a failed rebuild
+WATCH_INTERVAL_SECONDS = 10
+REINDEX_RETRY_SECONDS = 5 * 60
+
+# PDFs that failed to ingest (e.g. embeddings still rate-limited after every retry) are tried
+# again after this long, doubling up to the max while they keep failing
+FAILED_PDF_RETRY_SECONDS = 5 * 60
+FAILED_PDF_RETRY_MAX_SECONDS = 60 * 60
+
+# A failed warm-up (network, a locked store) is retried after this long, doubling up to the max
+WARM_UP_RETRY_SECONDS = 5
+WARM_UP_RETRY_MAX_SECONDS = 5 * 60
+
+
+# Function to get the folder of the index being served
+def live_index_path(db_path):
+    try:
+        with open(os.path.join(db_path, LIVE_INDEX_FILENAME), "r", encoding="utf-8") as file:
+            path = os.path.join(db_path, json.load(file)["path"])
+    except (OSError, ValueError, KeyError):
+        return db_path
+    return path if os.path.isdir(path) else db_path
+
+
+# Function to point the served index at another folder, atomically
+def set_live_index_path(db_path, path):
+    pointer_path = os.path.join(db_path, LIVE_INDEX_FILENAME)
+    temp_path = pointer_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump({"path": os.path.relpath(path, db_path)}, file)
+    os.replace(temp_path, pointer_path)
+
+
+# Function to take a cheap snapshot of the PDF folder ({filename: (size, mtime)}) so the
+# watcher only hashes files once something has changed
+def folder_snapshot(pdf_folder):
+    if not os.path.isdir(pdf_folder):
+        return {}
+    snapshot = {}
+    for pdf_file in list_pdf_files(pdf_folder):
+        try:
+            stat = os.stat(os.path.join(pdf_folder, pdf_file))
+        except OSError:
+            continue
+        snapshot[pdf_file] = (stat.st_size, stat.st_mtime)
+    return snapshot
+
+
+class CorpusIndex:
+    """The Lab 4 collection and BM25 index, kept up to date with the PDF folder.
+
+    `start()` runs the ingestion on a daemon thread, so no page waits for it unless it needs
+    the index; chromadb, PyPDF2 and the OpenAI client are only imported on that thread. The
+    same thread then watches the folder: added, changed and removed PDFs are indexed into a
+    staging copy of the index, which replaces the live one in a single swap once it is
+    complete. Queries therefore never see a half-built index nor wait for ingestion.
+    """
+
+    def __init__(self, api_key, pdf_folder=PDF_FOLDER, db_path=DB_PATH, watch_interval=WATCH_INTERVAL_SECONDS):
+        self.api_key = api_key
+        self.pdf_folder = pdf_folder
+        self.db_path = db_path
+        self.watch_interval = watch_interval  # None: index once, do not watch
+        self.embedding_service = None
+        self.errors = {}  # filename -> message, for PDFs that could not be ingested
+        self.extraction_timings = {}
+        self.error = None  # set while the warm-up is failing (it is retried in the background)
+        self.reindex_error = None  # set when the last background rebuild failed
+        self.reindexing = False
+        self.progress = (0, 0, None)  # (done, total, last processed file)
+        self._live = None  # {"collection", "bm25_index", "index_version", "path", "updated_at"}
+        self._retired_path = None  # the previously live index, deleted at the next swap
+        self._folder_state = None
+        self._retry_at = 0
+        self._failed_pdf_retry_at = 0
+        self._failed_pdf_retry_seconds = FAILED_PDF_RETRY_SECONDS
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._reindex_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def collection(self):
+        return self._live and self._live["collection"]
+
+    @property
+    def bm25_index(self):
+        return self._live and self._live["bm25_index"]
+
+    @property
+    def index_version(self):
+        return self._live and self._live["index_version"]
+
+    # Function to get the live index as one consistent dict (collection, BM25 index, version,
+    # folder and swap time), or None before the warm-up is done. Hold on to it for a whole
+    # query rather than reading the attributes one by one across a swap.
+    def snapshot(self):
+        return self._live
+
+    # Function to start the warm-up and then the folder watcher (only the first call does
+    # anything)
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="corpus-index", daemon=True)
+                self._thread.start()
+        return self
+
+    # Function to stop watching the folder
+    def stop(self):
+        self._stop.set()
+
+    # Function to wait for the warm-up; returns True once the index is ready (or failed)
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def _on_progress(self, done, total, pdf_file):
+        self.progress = (done, total, pdf_file)
+
+    def _run(self):
+        retry_seconds = WARM_UP_RETRY_SECONDS
+        while not self._warm_up():
+            if self._stop.wait(retry_seconds):
+                return
+            retry_seconds = min(retry_seconds * 2, WARM_UP_RETRY_MAX_SECONDS)
+        if self.watch_interval:
+            self._watch()
+
+    # Function to ingest the PDF folder into the index in `path`, in place
+    def _ingest(self, path, collection, bm25_index):
+        from ingestion import ingest_folder, ingestion_signature
+
+        result = ingest_folder(
+            self.pdf_folder,
+            path,
+            collection,
+            bm25_index,
+            self.embedding_service,
+            CHUNK_SIZE,
+            CHUNK_OVERLAP,
+            signature=ingestion_signature(CHUNK_SIZE, CHUNK_OVERLAP, VECTOR_STORE_CONFIG),
+            on_progress=self._on_progress,
+        )
+        self.errors = result["errors"]
+        self.extraction_timings = result["extraction_timings"]
+        return result
+
+    # Function to bring the live index up to date; returns False if it failed. Pages stop
+    # waiting either way (`ready`), and see the failure in `error` until a retry succeeds.
+    def _warm_up(self):
+        start = time.perf_counter()
+        error = None
+        try:
+            from bm25_index import BM25_FILENAME, BM25Index
+            from embeddings import EmbeddingService
+            from shared_clients import get_openai_client
+            from vector_store import open_vector_store
+
+            if not os.path.exists(self.pdf_folder):
+                raise FileNotFoundError(f"PDF folder not found: {self.pdf_folder}")
+            # Nothing is served yet, so the live index is brought up to date in place
+            path = live_index_path(self.db_path)
+            self._remove_stale_generations(path)
+            self._folder_state = folder_snapshot(self.pdf_folder)
+            collection = open_vector_store(path, COLLECTION_NAME, VECTOR_STORE_CONFIG)
+            bm25_index = BM25Index.load(os.path.join(path, BM25_FILENAME))
+            self.embedding_service = EmbeddingService(
+                get_openai_client(self.api_key), dimensions=VECTOR_STORE_CONFIG.get("dimensions"), lab="lab4"
+            )
+            result = self._ingest(path, collection, bm25_index)
+            self._live = {
+                "collection": collection,
+                "bm25_index": bm25_index,
+                "index_version": result["index_version"],
+                "path": path,
+                "updated_at": time.time(),
+            }
+            self._schedule_failed_pdf_retry()
+        except Exception as caught:
+            error = f"{type(caught).__name__}: {caught}"
+        self.error = error
+        record_span("index_warm_up", time.perf_counter() - start, "lab4", error=error)
+        self._ready.set()
+        return error is None
+
+    # Function to plan the next attempt at the PDFs that failed to ingest, backing off while
+    # they keep failing
+    def _schedule_failed_pdf_retry(self):
+        if not self.errors:
+            self._failed_pdf_retry_seconds = FAILED_PDF_RETRY_SECONDS
+            return
+        self._failed_pdf_retry_at = time.time() + self._failed_pdf_retry_seconds
+        self._failed_pdf_retry_seconds = min(self._failed_pdf_retry_seconds * 2, FAILED_PDF_RETRY_MAX_SECONDS)
+
+    # Function to poll the PDF folder and re-index when it changes, or when PDFs that failed
+    # to ingest are due for another try. A change is only acted on once the folder looks the
+    # same for a whole interval, so PDFs that are still being copied in are not indexed
+    # half-written.
+    def _watch(self):
+        pending_state = None
+        while not self._stop.wait(self.watch_interval):
+            current_state = folder_snapshot(self.pdf_folder)
+            folder_changed = current_state != self._folder_state
+            retry_failed_pdfs = bool(self.errors) and time.time() >= self._failed_pdf_retry_at
+            if not (folder_changed or retry_failed_pdfs) or time.time() < self._retry_at:
+                pending_state = None
+                continue
+            if folder_changed and current_state != pending_state:
+                pending_state = current_state
+                continue
+            pending_state = None
+            try:
+                self.reindex()
+                self.reindex_error = None
+                self._folder_state = current_state
+                self._schedule_failed_pdf_retry()
+            except Exception as error:
+                self.reindex_error = f"{type(error).__name__}: {error}"
+                self._retry_at = time.time() + REINDEX_RETRY_SECONDS
+
+    # Function to bring the index up to date with the PDF folder without touching the live
+    # index: it is copied (chunks and embeddings, nothing is embedded again) into a new
+    # staging folder, the added, changed and removed PDFs are applied there, and the staging
+    # index is then swapped in. Returns True if a new index was swapped in (not when, say, the
+    # only changed PDF failed to ingest again).
+    def reindex(self):
+        from bm25_index import BM25_FILENAME, BM25Index
+        from document_index import load_manifest, plan_ingestion, save_manifest
+        from ingestion import indexed_filenames, ingestion_signature
+        from vector_store import copy_collection, open_vector_store
+
+        with self._reindex_lock:
+            live = self._live
+            manifest = load_manifest(live["path"])
+            signature = ingestion_signature(CHUNK_SIZE, CHUNK_OVERLAP, VECTOR_STORE_CONFIG)
+            changed, removed, _ = plan_ingestion(
+                self.pdf_folder, manifest, indexed_filenames(live["collection"]), signature=signature
+            )
+            if not changed and not removed:
+                return False
+
+            start = time.perf_counter()
+            staging_path = os.path.join(self.db_path, GENERATIONS_FOLDER, str(time.time_ns()))
+            self.reindexing = True
+            error = None
+            try:
+                collection = open_vector_store(staging_path, COLLECTION_NAME, VECTOR_STORE_CONFIG)
+                copy_collection(live["collection"], collection)
+                bm25_index = BM25Index.load(os.path.join(live["path"], BM25_FILENAME))
+                save_manifest(staging_path, manifest)
+                result = self._ingest(staging_path, collection, bm25_index)
+            except Exception as caught:
+                error = type(caught).__name__
+                self._remove_generation(staging_path)
+                raise
+            finally:
+                self.reindexing = False
+                record_span(
+                    "index_reindex", time.perf_counter() - start, "lab4",
+                    changed=len(changed), removed=len(removed), error=error,
+                )
+
+            if result["index_version"] == live["index_version"]:
+                self._remove_generation(staging_path)
+                return False
+
+            # The swap: new sessions and questions use the staging index from here on
+            set_live_index_path(self.db_path, staging_path)
+            self._live = {
+                "collection": collection,
+                "bm25_index": bm25_index,
+                "index_version": result["index_version"],
+                "path": staging_path,
+                "updated_at": time.time(),
+            }
+
+            # Queries that started before the swap may still read the replaced index, so only
+            # the one replaced by the previous swap is deleted
+            if self._retired_path:
+                self._remove_generation(self._retired_path)
+            self._retired_path = live["path"]
+            return True
+
+    # Function to delete index folders left behind by earlier processes
+    def _remove_stale_generations(self, live_path):
+        generations_path = os.path.join(self.db_path, GENERATIONS_FOLDER)
+        if not os.path.isdir(generations_path):
+            return
+        for name in os.listdir(generations_path):
+            path = os.path.join(generations_path, name)
+            if os.path.abspath(path) != os.path.abspath(live_path):
+                self._remove_generation(path)
+
+    def _remove_generation(self, path):
+        from shared_clients import release_chroma_client
+
+        # DB_PATH itself (the index before the first rebuild) is left alone
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(os.path.join(self.db_path, GENERATIONS_FOLDER)):
+            # Close the folder's Chroma client (and its SQLite files) before deleting it
+            release_chroma_client(path)
+            shutil.rmtree(path, ignore_errors=True)
+
+
+_lock = threading.Lock()
+_corpus_indexes = {}
+
+
+# Function to get the process-wide corpus index for an API key, starting its warm-up
+def get_corpus_index(api_key):
+    with _lock:
+        corpus = _corpus_indexes.get(api_key)
+        if corpus is None:
+            corpus = _corpus_indexes[api_key] = CorpusIndex(api_key)
+    return corpus.start()
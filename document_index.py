@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+
+# Name of the ingestion manifest stored next to the ChromaDB files
+MANIFEST_FILENAME = "ingestion_manifest.json"
+
+
+# Function to compute the SHA-256 hash of a file without loading it all at once
+def hash_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to load the ingestion manifest ({filename: {"size", "mtime", "sha256"}})
+def load_manifest(db_path):
+    manifest_path = os.path.join(db_path, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        # A corrupt manifest only costs one full re-ingestion
+        return {}
+
+
+# Function to write the manifest atomically so a crash never leaves half a file behind
+def save_manifest(db_path, manifest):
+    os.makedirs(db_path, exist_ok=True)
+    manifest_path = os.path.join(db_path, MANIFEST_FILENAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+
+# Function to list the PDF files in a folder
+def list_pdf_files(pdf_folder):
+    return sorted(name for name in os.listdir(pdf_folder) if name.endswith(".pdf"))
+
+
+# Function to work out which PDFs must be (re-)ingested and which must be removed.
+# Returns (changed, removed, manifest): `changed` maps filename -> new manifest entry,
+# `removed` lists filenames that are no longer on disk and `manifest` is the updated
+# manifest for every file that does not need re-embedding. `indexed_files` are the files the
+# index holds chunks of; they are also removed once gone from disk, even without a manifest
+# entry (a changed PDF that failed to ingest keeps its old chunks but loses its entry).
+# `signature` describes the indexing settings (e.g. chunk size); entries built with other
+# settings are re-ingested.
+def plan_ingestion(pdf_folder, manifest, indexed_files=None, signature=None):
+    changed = {}
+    updated_manifest = {}
+    pdf_files = list_pdf_files(pdf_folder)
+    for pdf_file in pdf_files:
+        pdf_path = os.path.join(pdf_folder, pdf_file)
+        stat = os.stat(pdf_path)
+        previous = manifest.get(pdf_file)
+        in_index = indexed_files is None or pdf_file in indexed_files
+        if previous and previous.get("signature") != signature:
+            previous = None
+
+        # Size and mtime unchanged: trust the manifest and skip hashing entirely
+        if (
+            previous
+            and in_index
+            and previous["size"] == stat.st_size
+            and previous["mtime"] == stat.st_mtime
+        ):
+            updated_manifest[pdf_file] = previous
+            continue
+
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": hash_file(pdf_path),
+            "signature": signature,
+        }
+        if previous and in_index and previous["sha256"] == entry["sha256"]:
+            # Touched but identical content: refresh the manifest, keep the vectors
+            updated_manifest[pdf_file] = entry
+        else:
+            changed[pdf_file] = entry
+
+    removed = sorted((set(manifest) | set(indexed_files or ())) - set(pdf_files))
+    return changed, removed, updated_manifest
+
+
+# Function to derive a short version string for the indexed corpus from its manifest
+def index_version(manifest):
+    fingerprint = json.dumps(
+        {name: [entry["sha256"], entry.get("signature")] for name, entry in manifest.items()},
+        sort_keys=True,
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:12]
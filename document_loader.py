@@ -0,0 +1,183 @@
+import codecs
+import hashlib
+import os
+import re
+from html.parser import HTMLParser
+
+from chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, iter_chunks
+from pdf_extraction import iter_pdf_pages
+
+# File types accepted by the document pages
+SUPPORTED_TYPES = ("txt", "md", "pdf", "html", "htm")
+
+# Bytes read from the upload at a time
+BLOCK_SIZE = 1 << 20
+
+# Bytes looked at to guess the encoding of a text file
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# Encoding used when nothing better can be detected (never fails to decode), and preferred
+# when the detector cannot tell it apart from other single-byte code pages
+FALLBACK_ENCODING = "cp1252"
+AMBIGUOUS_CHAOS_MARGIN = 0.02
+
+# Byte order marks, longest first so UTF-32 is not mistaken for UTF-16
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_\-]+)""", re.IGNORECASE)
+
+
+# Function to guess the text encoding of the first bytes of a file: a byte order mark wins,
+# then UTF-8 if the bytes are valid UTF-8, then charset_normalizer (when installed)
+def detect_encoding(sample):
+    for byte_order_mark, encoding in BYTE_ORDER_MARKS:
+        if sample.startswith(byte_order_mark):
+            return encoding
+    try:
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as error:
+        # A character cut in half at the end of the sample is still valid UTF-8
+        if error.reason == "unexpected end of data" and error.start >= len(sample) - 3:
+            return "utf-8"
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return FALLBACK_ENCODING
+    matches = from_bytes(sample)
+    best_match = matches.best()
+    if best_match is None:
+        return FALLBACK_ENCODING
+    # Short Western samples often score the same in several legacy code pages
+    for match in matches:
+        if (
+            match.encoding == FALLBACK_ENCODING
+            and match.chaos <= best_match.chaos + AMBIGUOUS_CHAOS_MARGIN
+            and match.coherence >= best_match.coherence
+        ):
+            return FALLBACK_ENCODING
+    return best_match.encoding
+
+
+# Function to get the file type of an upload from its name ("report.PDF" -> "pdf")
+def file_type(name):
+    return os.path.splitext(name or "")[1].lstrip(".").lower() or "txt"
+
+
+# Function to read an upload block by block, starting from the beginning
+def iter_blocks(file, block_size=BLOCK_SIZE):
+    file.seek(0)
+    for block in iter(lambda: file.read(block_size), b""):
+        yield block
+
+
+# Function to decode a binary file incrementally, yielding text blocks. Undecodable bytes
+# become U+FFFD instead of failing the whole upload.
+def iter_decoded_text(file, encoding=None, block_size=BLOCK_SIZE):
+    file.seek(0)
+    sample = file.read(ENCODING_SAMPLE_SIZE)
+    encoding = encoding or detect_encoding(sample)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    if sample:
+        yield decoder.decode(sample)
+    for block in iter(lambda: file.read(block_size), b""):
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+class _HTMLTextParser(HTMLParser):
+    """Collects the visible text of an HTML document as it is fed."""
+
+    SKIPPED_TAGS = {"script", "style", "noscript", "template", "head"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "pre"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.pieces.append(data)
+
+    def take(self):
+        text = "".join(self.pieces)
+        self.pieces = []
+        return text
+
+
+# Function to extract the visible text of an HTML file block by block
+def iter_html_text(file, block_size=BLOCK_SIZE):
+    file.seek(0)
+    sample = file.read(ENCODING_SAMPLE_SIZE)
+    declared = META_CHARSET.search(sample)
+    encoding = None
+    if declared:
+        try:
+            encoding = codecs.lookup(declared.group(1).decode("ascii")).name
+        except LookupError:
+            encoding = None
+    parser = _HTMLTextParser()
+    for text in iter_decoded_text(file, encoding, block_size):
+        parser.feed(text)
+        yield parser.take()
+    parser.close()
+    yield parser.take()
+
+
+# Function to read an uploaded document (a Streamlit UploadedFile or any binary file object)
+# as (page number, text) pieces. PDFs use the same extractor as Lab 4 and yield one piece per
+# page; text, Markdown and HTML files are decoded incrementally as page 1.
+def iter_document_pieces(file, name=None):
+    kind = file_type(name or getattr(file, "name", None))
+    if kind == "pdf":
+        file.seek(0)
+        for page_number, page_text in enumerate(iter_pdf_pages(file), start=1):
+            yield page_number, page_text
+        return
+    blocks = iter_html_text(file) if kind in ("html", "htm") else iter_decoded_text(file)
+    for text in blocks:
+        if text:
+            yield 1, text
+
+
+# Function to split an uploaded document into chunks lazily (see chunking.iter_chunks)
+def iter_document_chunks(file, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_CHUNK_OVERLAP, name=None):
+    return iter_chunks(iter_document_pieces(file, name), chunk_size, overlap)
+
+
+# Function to fingerprint an upload by content without reading it into memory at once
+def document_fingerprint(file):
+    digest = hashlib.sha256()
+    for block in iter_blocks(file):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+# Function to get the content hash of an upload, computed once per uploaded file and kept in
+# `session_state` (Streamlit's st.session_state, or any dict) across reruns
+def get_fingerprint(uploaded_file, session_state):
+    file_key = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    if session_state.get("upload_key") != file_key:
+        session_state["upload_key"] = file_key
+        session_state["upload_fingerprint"] = document_fingerprint(uploaded_file)
+    return session_state["upload_fingerprint"]
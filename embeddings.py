@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from context_builder import count_tokens, truncate_tokens
+from tracing import add_usage, span
+
+# Model used for every embedding in the app
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Request limits of the OpenAI embeddings endpoint
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+MAX_TOKENS_PER_INPUT = 8191
+
+# Batches are packed to this share of MAX_TOKENS_PER_REQUEST, as local token counts can
+# differ slightly from the API's (and are only estimated without tiktoken)
+REQUEST_TOKEN_MARGIN = 0.9
+
+# Errors worth retrying: rate limits and transient server/network failures
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+# Function to build the model options for an embeddings request; `dimensions` asks
+# text-embedding-3 models for shorter vectors
+def embedding_options(model=EMBEDDING_MODEL, dimensions=None):
+    options = {"model": model}
+    if dimensions:
+        options["dimensions"] = dimensions
+    return options
+
+
+# Function to split texts into batches that respect the per-request input and token limits,
+# counting tokens with the embedding model's tokenizer. Returns a list of batches, each a
+# list of indexes into `texts`.
+def pack_batches(texts, max_inputs=MAX_INPUTS_PER_REQUEST, max_tokens=MAX_TOKENS_PER_REQUEST, model=EMBEDDING_MODEL):
+    max_tokens = int(max_tokens * REQUEST_TOKEN_MARGIN)
+    batches = []
+    current_batch = []
+    current_tokens = 0
+    for index, text in enumerate(texts):
+        text_tokens = count_tokens(text, model)
+        if current_batch and (
+            len(current_batch) >= max_inputs or current_tokens + text_tokens > max_tokens
+        ):
+            batches.append(current_batch)
+            current_batch = []
+            current_tokens = 0
+        current_batch.append(index)
+        current_tokens += text_tokens
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+
+class EmbeddingService:
+    """Embeds many texts with as few, concurrent, retried requests as possible."""
+
+    def __init__(
+        self,
+        client,
+        model=EMBEDDING_MODEL,
+        max_inputs=MAX_INPUTS_PER_REQUEST,
+        max_tokens=MAX_TOKENS_PER_REQUEST,
+        max_workers=4,
+        max_retries=5,
+        backoff_seconds=1.0,
+        dimensions=None,
+        lab=None,
+    ):
+        self.client = client
+        self.lab = lab
+        self.model = model
+        self.dimensions = dimensions
+        self.max_inputs = max_inputs
+        self.max_tokens = max_tokens
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    # Function to embed a list of texts, returning the embeddings in the same order
+    def embed(self, texts):
+        # The API rejects empty strings and inputs over the per-input token limit
+        texts = [self._prepare(text) for text in texts]
+        batches = pack_batches(texts, self.max_inputs, self.max_tokens, self.model)
+        embeddings = [None] * len(texts)
+
+        def run_batch(batch):
+            vectors = self._request([texts[index] for index in batch])
+            for index, vector in zip(batch, vectors):
+                embeddings[index] = vector
+
+        if len(batches) <= 1 or self.max_workers <= 1:
+            for batch in batches:
+                run_batch(batch)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+                # list() re-raises the first error from any batch
+                list(pool.map(run_batch, batches))
+        return embeddings
+
+    def _prepare(self, text):
+        return truncate_tokens(text or " ", MAX_TOKENS_PER_INPUT, self.model)
+
+    # Function to send one embeddings request, retrying transient errors with backoff
+    def _request(self, batch_texts):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._count_lock:
+                    self.request_count += 1
+                with span("embedding", self.lab, self.model, inputs=len(batch_texts), attempt=attempt) as attributes:
+                    response = self.client.embeddings.create(input=batch_texts, **embedding_options(self.model, self.dimensions))
+                    add_usage(attributes, response.usage)
+                ordered = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in ordered]
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                # Exponential backoff with jitter so concurrent batches do not retry in lockstep
+                delay = self.backoff_seconds * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay / 2))
@@ -0,0 +1,135 @@
+import os
+
+from bm25_index import BM25_FILENAME
+from chunking import chunk_pages
+from document_index import index_version, load_manifest, plan_ingestion, save_manifest
+from pdf_extraction import iter_extracted_pdfs
+from tracing import record_span, span
+from vector_store import flush_vector_store, store_signature
+
+
+# Function to describe the settings that change the stored chunks, for the ingestion manifest
+def ingestion_signature(chunk_size, chunk_overlap, store_config):
+    return f"chunks:{chunk_size}:{chunk_overlap}:{store_signature(store_config)}"
+
+
+# Function to get the names of the files the collection holds chunks of
+def indexed_filenames(document_collection):
+    return {metadata["filename"] for metadata in document_collection.get(include=["metadatas"])["metadatas"]}
+
+
+# Function to replace the stored chunks of a document in the vector store and the BM25 index
+def store_document_chunks(document_collection, bm25_index, pdf_file, chunks, chunk_embeddings, lab="lab4"):
+    document_collection.delete(where={"filename": pdf_file})
+    bm25_index.remove_file(pdf_file)
+    add_document_chunks(document_collection, bm25_index, pdf_file, chunks, chunk_embeddings, lab)
+
+
+# Function to add the chunks of a document to the vector store and the BM25 index
+def add_document_chunks(document_collection, bm25_index, pdf_file, chunks, chunk_embeddings, lab="lab4"):
+    if not chunks:
+        return
+    # Add the chunks with their page and offset metadata
+    chunk_ids = [f"{pdf_file}#{chunk['chunk_index']}" for chunk in chunks]
+    chunk_metadatas = [
+        {
+            "filename": pdf_file,
+            "page": chunk["page"],
+            "page_end": chunk["page_end"],
+            "start_offset": chunk["start_offset"],
+            "end_offset": chunk["end_offset"],
+            "chunk_index": chunk["chunk_index"],
+        }
+        for chunk in chunks
+    ]
+    with span("vector_upsert", lab, chunks=len(chunks)):
+        document_collection.upsert(
+            documents=[chunk["text"] for chunk in chunks],
+            metadatas=chunk_metadatas,
+            ids=chunk_ids,
+            embeddings=chunk_embeddings
+        )
+    for chunk_id, chunk, metadata in zip(chunk_ids, chunks, chunk_metadatas):
+        bm25_index.add(chunk_id, chunk["text"], metadata)
+
+
+# Function to rebuild the BM25 index from the collection when the two have drifted apart
+def sync_bm25_index(document_collection, bm25_index):
+    if len(bm25_index) == document_collection.count():
+        return False
+    stored = document_collection.get(include=["documents", "metadatas"])
+    for doc_id in list(bm25_index.doc_lengths):
+        bm25_index.remove(doc_id)
+    for doc_id, text, metadata in zip(stored['ids'], stored['documents'], stored['metadatas']):
+        bm25_index.add(doc_id, text, metadata)
+    return True
+
+
+# Function to bring the collection and BM25 index in `db_path` up to date with the PDFs in
+# `pdf_folder`. Unchanged files are skipped (see document_index.plan_ingestion); new or
+# modified ones are extracted in a process pool and each is chunked, embedded and stored as
+# soon as it is extracted. `on_progress(done, total, pdf_file)` is called from the calling
+# thread. Returns a dict with "changed", "removed", "errors" ({filename: message}),
+# "extraction_timings" and "index_version".
+def ingest_folder(
+    pdf_folder,
+    db_path,
+    document_collection,
+    bm25_index,
+    embedding_service,
+    chunk_size,
+    chunk_overlap,
+    signature=None,
+    on_progress=None,
+    lab="lab4",
+):
+    # Compare the folder against the ingestion manifest so unchanged PDFs are skipped
+    manifest = load_manifest(db_path)
+    changed, removed, manifest = plan_ingestion(
+        pdf_folder, manifest, indexed_filenames(document_collection), signature=signature
+    )
+
+    # Drop the chunks of documents whose files were deleted from the folder
+    for pdf_file in removed:
+        document_collection.delete(where={"filename": pdf_file})
+        bm25_index.remove_file(pdf_file)
+
+    errors = {}
+    extraction_timings = {}
+    pdf_paths = [os.path.join(pdf_folder, pdf_file) for pdf_file in changed]
+    for done_count, result in enumerate(iter_extracted_pdfs(pdf_paths), start=1):
+        pdf_file = os.path.basename(result["path"])
+        extraction_timings[pdf_file] = result["seconds"]
+        record_span(
+            "pdf_extraction", result["seconds"], lab, pages=len(result["pages"] or []), error=result["error"]
+        )
+        if on_progress:
+            on_progress(done_count, len(pdf_paths), pdf_file)
+        if result["error"]:
+            errors[pdf_file] = result["error"]
+            continue
+        try:
+            # Split the text into overlapping chunks and embed them in batched requests
+            chunks = chunk_pages(result["pages"], chunk_size, chunk_overlap)
+            chunk_embeddings = embedding_service.embed([chunk["text"] for chunk in chunks]) if chunks else []
+
+            # Replace any chunks left over from a previous version of the file
+            store_document_chunks(document_collection, bm25_index, pdf_file, chunks, chunk_embeddings, lab)
+            manifest[pdf_file] = changed[pdf_file]
+        except Exception as error:
+            errors[pdf_file] = str(error)
+
+    # Record what is now in the collection for the next warm start
+    rebuilt_bm25 = sync_bm25_index(document_collection, bm25_index)
+    flush_vector_store(document_collection)
+    if changed or removed or rebuilt_bm25:
+        save_manifest(db_path, manifest)
+        bm25_index.save(os.path.join(db_path, BM25_FILENAME))
+
+    return {
+        "changed": sorted(changed),
+        "removed": removed,
+        "errors": errors,
+        "extraction_timings": extraction_timings,
+        "index_version": index_version(manifest),
+    }
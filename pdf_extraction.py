@@ -0,0 +1,163 @@
+import os
+import time
+from collections import deque
+
+# Seconds to wait for a single PDF before giving up on it
+DEFAULT_TIMEOUT_SECONDS = 120
+
+
+# Function to extract the text of each page of a PDF file
+def extract_pdf_pages(pdf_path):
+    with open(pdf_path, "rb") as file:
+        return list(iter_pdf_pages(file))
+
+
+# Function to yield the text of each page of a PDF (a path or a binary file object) one page
+# at a time, so only the current page's text is held in memory
+def iter_pdf_pages(pdf_file):
+    # Imported here so pages that never read a PDF do not pay for it
+    from PyPDF2 import PdfReader
+
+    pdf_reader = PdfReader(pdf_file)
+    for page in pdf_reader.pages:
+        yield page.extract_text() or ''
+
+
+# Function run in a worker process: never raises, so one corrupt PDF cannot break the pool
+def _extract_worker(pdf_path):
+    start = time.perf_counter()
+    try:
+        pages = extract_pdf_pages(pdf_path)
+        error = None
+    except Exception as exc:
+        pages = None
+        error = f"{type(exc).__name__}: {exc}"
+    return {
+        "path": pdf_path,
+        "pages": pages,
+        "error": error,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# Function run by each worker process: extract the PDFs it is sent, one at a time, until it
+# is sent None
+def _worker_loop(connection):
+    while True:
+        pdf_path = connection.recv()
+        if pdf_path is None:
+            return
+        connection.send(_extract_worker(pdf_path))
+
+
+class _ExtractionWorker:
+    """A worker process extracting one PDF at a time, that can be killed when it gets stuck."""
+
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_loop, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.pdf_path = None
+        self.started = None
+
+    def submit(self, pdf_path):
+        self.pdf_path = pdf_path
+        self.started = time.perf_counter()
+        self.connection.send(pdf_path)
+
+    # Function to take the finished PDF off the worker and return it
+    def finish(self):
+        pdf_path, self.pdf_path = self.pdf_path, None
+        return pdf_path
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.connection.close()
+
+
+# Function to get the start method for worker processes. The app runs inside the threaded
+# Streamlit server, which must not be forked, so workers are spawned (or forked from a
+# clean fork server where there is one).
+def _worker_context():
+    import multiprocessing
+
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+# Function to extract many PDFs in worker processes, yielding each result as soon as its
+# file is done. Every result is a dict with "path", "pages", "error" and "seconds". A PDF
+# that takes longer than `timeout_seconds` is reported as timed out and its worker is killed
+# and replaced, so a stuck file never holds up the others.
+def iter_extracted_pdfs(pdf_paths, max_workers=None, timeout_seconds=DEFAULT_TIMEOUT_SECONDS):
+    from multiprocessing.connection import wait as wait_for_connections
+
+    pdf_paths = list(pdf_paths)
+    if not pdf_paths:
+        return
+    # Even a single file goes to a worker process, so the timeout always applies and the
+    # parse never holds the server's GIL
+    max_workers = max(1, max_workers or min(len(pdf_paths), os.cpu_count() or 1))
+    context = _worker_context()
+    queued = deque(pdf_paths)
+    idle_workers = []
+    busy_workers = {}  # connection -> worker
+    try:
+        while queued or busy_workers:
+            # Hand out queued PDFs, starting workers as needed
+            while queued and len(busy_workers) < max_workers:
+                worker = idle_workers.pop() if idle_workers else _ExtractionWorker(context)
+                worker.submit(queued.popleft())
+                busy_workers[worker.connection] = worker
+
+            now = time.perf_counter()
+            next_deadline = min(worker.started for worker in busy_workers.values()) + timeout_seconds
+            for connection in wait_for_connections(list(busy_workers), timeout=max(0.0, next_deadline - now)):
+                worker = busy_workers.pop(connection)
+                try:
+                    result = connection.recv()
+                except (EOFError, OSError):
+                    # The worker process itself died (e.g. out of memory)
+                    worker.kill()
+                    yield {
+                        "path": worker.finish(),
+                        "pages": None,
+                        "error": f"Worker process exited with code {worker.process.exitcode}",
+                        "seconds": time.perf_counter() - worker.started,
+                    }
+                    continue
+                worker.finish()
+                idle_workers.append(worker)
+                yield result
+
+            # Kill the workers stuck on a PDF for too long; queued PDFs get fresh workers
+            now = time.perf_counter()
+            for connection, worker in list(busy_workers.items()):
+                if now - worker.started >= timeout_seconds:
+                    del busy_workers[connection]
+                    worker.kill()
+                    yield {
+                        "path": worker.finish(),
+                        "pages": None,
+                        "error": f"Timed out after {timeout_seconds} seconds",
+                        "seconds": now - worker.started,
+                    }
+    finally:
+        for worker in idle_workers:
+            worker.close()
+        for worker in busy_workers.values():
+            worker.kill()
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+# Default limits for cached answers
+DEFAULT_ANSWER_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ANSWERS = 500
+DEFAULT_MAX_QUERIES = 5000
+
+
+# Function to normalize a query so trivial differences (case, spacing, trailing
+# punctuation) map to the same cache entry
+def normalize_query(query):
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+# Function to build the cache key for a query against a given index version
+def cache_key(query, index_version, *extra):
+    parts = [normalize_query(query), index_version or "", *[str(part) for part in extra]]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class RagCache:
+    """SQLite-backed cache of query embeddings, retrieved ids and generated answers."""
+
+    def __init__(
+        self,
+        db_file,
+        answer_ttl_seconds=DEFAULT_ANSWER_TTL_SECONDS,
+        max_answers=DEFAULT_MAX_ANSWERS,
+        max_queries=DEFAULT_MAX_QUERIES,
+    ):
+        self.answer_ttl_seconds = answer_ttl_seconds
+        self.max_answers = max_answers
+        self.max_queries = max_queries
+        self.stats = {"query_hits": 0, "query_misses": 0, "answer_hits": 0, "answer_misses": 0}
+        self._lock = threading.Lock()
+        # Streamlit serves every session from its own thread, so share one guarded connection
+        self._connection = sqlite3.connect(db_file, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS query_cache ("
+                "key TEXT PRIMARY KEY, embedding TEXT, result_ids TEXT, created_at REAL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                "key TEXT PRIMARY KEY, answer TEXT, metadata TEXT, created_at REAL, last_used_at REAL)"
+            )
+
+    def _count(self, name):
+        self.stats[name] += 1
+
+    # Function to look up the cached embedding and retrieved ids of a query
+    def get_query(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT embedding, result_ids FROM query_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self._count("query_hits" if row else "query_misses")
+        if not row:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    # Function to store the embedding and retrieved ids of a query
+    def put_query(self, key, embedding, result_ids):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(embedding), json.dumps(result_ids), time.time()),
+            )
+            self._connection.execute(
+                "DELETE FROM query_cache WHERE key NOT IN ("
+                "SELECT key FROM query_cache ORDER BY created_at DESC LIMIT ?)",
+                (self.max_queries,),
+            )
+
+    # Function to look up a cached answer, honouring the TTL
+    def get_answer(self, key):
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT answer, metadata, created_at FROM answer_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[2] > self.answer_ttl_seconds:
+                self._connection.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+                row = None
+            if row:
+                self._connection.execute(
+                    "UPDATE answer_cache SET last_used_at = ? WHERE key = ?", (now, key)
+                )
+            self._count("answer_hits" if row else "answer_misses")
+        if not row:
+            return None
+        return row[0], json.loads(row[1])
+
+    # Function to store an answer and evict the least recently used ones over the limit
+    def put_answer(self, key, answer, metadata=None):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO answer_cache VALUES (?, ?, ?, ?, ?)",
+                (key, answer, json.dumps(metadata or {}), now, now),
+            )
+            self._connection.execute(
+                "DELETE FROM answer_cache WHERE key NOT IN ("
+                "SELECT key FROM answer_cache ORDER BY last_used_at DESC LIMIT ?)",
+                (self.max_answers,),
+            )
+
+    # Function to remove every cached entry (e.g. after the index changes)
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM query_cache")
+            self._connection.execute("DELETE FROM answer_cache")
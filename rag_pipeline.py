@@ -0,0 +1,247 @@
+import asyncio
+import queue
+import threading
+import time
+
+from bm25_index import reciprocal_rank_fusion
+from context_builder import build_context
+from embeddings import EMBEDDING_MODEL, embedding_options
+from rag_cache import cache_key
+from tracing import STREAM_USAGE, record_span, trace_async_chat_stream
+
+# Maximum number of OpenAI requests in flight from this process, across all sessions
+MAX_CONCURRENT_OPENAI_CALLS = 8
+
+SYSTEM_PROMPT = "You are an intelligent and helpful assistant."
+RAG_PROMPT = """You are an AI assistant with knowledge from specific documents. Use the following context to answer the user's question. If the information is not in the context, say you don't know based on the available information.
+
+Context:
+{context}
+
+User Question: {question}
+
+Answer:"""
+
+
+class BackgroundLoop:
+    """An asyncio event loop running on a daemon thread, shared by every Streamlit session."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="rag-pipeline-loop", daemon=True)
+        self.thread.start()
+        self._openai_slots = None
+
+    # Function to get the semaphore that bounds OpenAI requests from every pipeline on this
+    # loop. Created lazily, from the loop, so it belongs to it.
+    def openai_slots(self):
+        if self._openai_slots is None:
+            self._openai_slots = asyncio.Semaphore(MAX_CONCURRENT_OPENAI_CALLS)
+        return self._openai_slots
+
+    # Function to run a coroutine on the loop and return a concurrent.futures.Future
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    # Function to run a coroutine on the loop and wait for its result
+    def run(self, coroutine):
+        return self.submit(coroutine).result()
+
+    # Function to consume an async iterator from synchronous code (e.g. the Streamlit script).
+    # Stopping early cancels the producer so abandoned streams do not keep running.
+    def iterate(self, async_iterable):
+        items = queue.Queue()
+        finished = object()
+
+        async def pump():
+            try:
+                async for item in async_iterable:
+                    items.put(item)
+            except Exception as error:
+                items.put(error)
+            finally:
+                items.put(finished)
+
+        future = self.submit(pump())
+        try:
+            while True:
+                item = items.get()
+                if item is finished:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+
+_loop_lock = threading.Lock()
+_background_loop = None
+
+
+# Function to get the process-wide background loop, starting it on first use
+def get_background_loop():
+    global _background_loop
+    with _loop_lock:
+        if _background_loop is None:
+            _background_loop = BackgroundLoop()
+        return _background_loop
+
+
+async def _nothing():
+    return None
+
+
+# Function to fetch chunks by id, keeping the order of `result_ids`
+def fetch_passages(db_collection, result_ids):
+    if not result_ids:
+        return []
+    search_results = db_collection.get(ids=result_ids, include=["documents", "metadatas"])
+    found = {
+        result_id: dict(metadata, text=text)
+        for result_id, text, metadata in zip(
+            search_results['ids'], search_results['documents'], search_results['metadatas']
+        )
+    }
+    return [found[result_id] for result_id in result_ids if result_id in found]
+
+
+class RagPipeline:
+    """Retrieval and generation over a document collection as one asyncio pipeline.
+
+    Used for the Lab 4 corpus and for the per-session index of a Lab 1 upload. The BM25
+    lookup and the query embedding + vector search run concurrently, OpenAI calls from all
+    pipelines share a bounded semaphore, and every stage is timed (and traced under `lab`).
+    """
+
+    def __init__(self, async_client, db_collection, bm25_index, rag_cache, chat_model, top_k, token_budget, dimensions=None, lab="lab4"):
+        self.async_client = async_client
+        self.db_collection = db_collection
+        self.bm25_index = bm25_index
+        self.rag_cache = rag_cache
+        self.chat_model = chat_model
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.dimensions = dimensions
+        self.lab = lab
+        self.background_loop = get_background_loop()
+
+    def _openai_slot(self):
+        return self.background_loop.openai_slots()
+
+    async def _timed(self, timings, stage, awaitable, model=None):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[stage] = time.perf_counter() - start
+            record_span(stage, timings[stage], self.lab, model)
+
+    async def _bm25_ids(self, query, timings):
+        results = await self._timed(timings, "bm25", asyncio.to_thread(self.bm25_index.search, query, self.top_k))
+        return [doc_id for doc_id, _ in results]
+
+    async def _embed_query(self, query, timings):
+        async with self._openai_slot():
+            response = await self._timed(
+                timings, "embedding", self.async_client.embeddings.create(
+                    input=query, **embedding_options(dimensions=self.dimensions)
+                ), model=EMBEDDING_MODEL
+            )
+        return response.data[0].embedding
+
+    async def _cached_or_embedded_query(self, query, index_version, timings):
+        # Repeat query: the embedding and vector search results are cached
+        cached_query = await asyncio.to_thread(self.rag_cache.get_query, cache_key(query, index_version, self.top_k))
+        if cached_query:
+            return {"query_embedding": cached_query[0], "vector_ids": cached_query[1]}
+        return {"query_embedding": await self._embed_query(query, timings)}
+
+    async def _prepare(self, query, mode, index_version, timings):
+        # The BM25 lookup and the query embedding run concurrently
+        bm25_ids, vector_lookup = await asyncio.gather(
+            self._bm25_ids(query, timings) if mode in ("hybrid", "bm25") else _nothing(),
+            self._cached_or_embedded_query(query, index_version, timings) if mode in ("hybrid", "vector") else _nothing(),
+        )
+        return {"timings": timings, "bm25_ids": bm25_ids, "query_embedding": None, **(vector_lookup or {})}
+
+    async def _vector_ids(self, query, index_version, prepared):
+        if "vector_ids" in prepared:
+            return prepared["vector_ids"]
+        search_results = await self._timed(prepared["timings"], "vector_query", asyncio.to_thread(
+            self.db_collection.query, query_embeddings=[prepared["query_embedding"]], n_results=self.top_k, include=[]
+        ))
+        result_ids = search_results['ids'][0]
+        await asyncio.to_thread(
+            self.rag_cache.put_query, cache_key(query, index_version, self.top_k), prepared["query_embedding"], result_ids
+        )
+        return result_ids
+
+    # Function to find the passages for a query and fit them into the token budget.
+    # `mode` is "hybrid" (BM25 and vector results fused by reciprocal rank), "vector" or "bm25".
+    # `prepared` (from `prepare`) saves running the BM25 lookup and the embedding again.
+    async def retrieve(self, query, mode="hybrid", index_version=None, timings=None, prepared=None):
+        start = time.perf_counter()
+        if prepared is None:
+            prepared = await self._prepare(query, mode, index_version, {} if timings is None else timings)
+        timings = prepared["timings"]
+        rankings = []
+        if prepared["bm25_ids"] is not None:
+            rankings.append(prepared["bm25_ids"])
+        if prepared["query_embedding"] is not None:
+            rankings.append(await self._vector_ids(query, index_version, prepared))
+        result_ids = reciprocal_rank_fusion(rankings)[: self.top_k]
+
+        passages = await self._timed(timings, "fetch", asyncio.to_thread(fetch_passages, self.db_collection, result_ids))
+        context = build_context(passages, self.chat_model, self.token_budget)
+        timings["retrieval"] = time.perf_counter() - start + timings.get("prepare", 0)
+        record_span("retrieval", timings["retrieval"], self.lab, mode=mode, context_tokens=context["tokens"])
+        return context
+
+    # Function to stream the answer text for a question and its context
+    async def generate(self, query, context_text, timings=None):
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        attributes = {}
+        async with self._openai_slot():
+            stream = await self.async_client.chat.completions.create(
+                model=self.chat_model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": RAG_PROMPT.format(context=context_text, question=query)},
+                ],
+                stream=True,
+                stream_options=STREAM_USAGE,
+            )
+            async for piece in trace_async_chat_stream(stream, self.lab, self.chat_model, attributes=attributes, start=start):
+                timings.setdefault("first_token", attributes["first_token_seconds"])
+                yield piece
+        timings["generation"] = time.perf_counter() - start
+
+    # Function for synchronous callers to run the first retrieval step on its own: the BM25
+    # lookup and (except in "bm25" mode) the query embedding, concurrently. Its result holds
+    # the "query_embedding" (e.g. to look up answers to similar questions) and can be passed
+    # to `answer` so nothing runs twice.
+    def prepare(self, query, mode="hybrid", index_version=None):
+        timings = {}
+        start = time.perf_counter()
+        prepared = self.background_loop.run(self._prepare(query, mode, index_version, timings))
+        timings["prepare"] = time.perf_counter() - start
+        return prepared
+
+    # Function for synchronous callers: retrieve now and return the context, the passages
+    # and an iterator over the streamed answer. `timings` fills in while the answer streams.
+    def answer(self, query, mode="hybrid", index_version=None, prepared=None):
+        timings = prepared["timings"] if prepared else {}
+        start = time.perf_counter() - timings.get("prepare", 0)
+        context = self.background_loop.run(self.retrieve(query, mode, index_version, timings, prepared))
+
+        def pieces():
+            yield from self.background_loop.iterate(self.generate(query, context["text"], timings))
+            timings["total"] = time.perf_counter() - start
+
+        return {"context": context, "passages": context["passages"], "pieces": pieces(), "timings": timings}
+
+    # Function for synchronous callers that only need the passages
+    def search(self, query, mode="hybrid", index_version=None):
+        return self.background_loop.run(self.retrieve(query, mode, index_version))
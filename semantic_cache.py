@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+from tracing import record_span
+
+# Default limits for cached responses
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 60 * 60
+
+
+# Function to bucket a number so values a `step` apart or less usually share a key
+# (bucket(19.6, 2) == bucket(20.4, 2) == 10)
+def bucket(value, step):
+    return int(round(float(value) / step))
+
+
+class SemanticCache:
+    """Bounded, expiring cache of responses to requests that mean the same thing.
+
+    Every entry lives in a `scope`, an exact key such as a bucketed request or an index
+    version. Requests without an embedding hit any entry in their scope; requests with one hit
+    the most similar stored embedding whose cosine similarity is at least `threshold`.
+    Entries expire after `ttl_seconds` and the least recently used go beyond `max_entries`.
+    Every lookup is traced as a `name` span with `hit` set, for the hit rate.
+    """
+
+    def __init__(
+        self,
+        threshold=DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        ttl_seconds=DEFAULT_TTL_SECONDS,
+        name="semantic_cache",
+        lab=None,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.lab = lab
+        self.stats = {"hits": 0, "misses": 0}
+        self._entries = OrderedDict()  # entry id -> entry, least recently used first
+        self._scopes = {}  # scope -> ids of its entries
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Function to get the share of lookups that were answered from the cache
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    # Function to look up a response: returns (response, metadata, similarity) or None
+    def get(self, scope, embedding=None):
+        start = time.perf_counter()
+        query = None if embedding is None else _unit_vector(embedding)
+        with self._lock:
+            self._evict_expired()
+            best_id, best_similarity = None, None
+            for entry_id in self._scopes.get(scope, ()):
+                entry = self._entries[entry_id]
+                if query is None or entry["embedding"] is None:
+                    similarity = 1.0 if query is None and entry["embedding"] is None else None
+                else:
+                    similarity = float(query @ entry["embedding"])
+                if similarity is not None and (best_similarity is None or similarity > best_similarity):
+                    best_id, best_similarity = entry_id, similarity
+            hit = best_id is not None and best_similarity >= self.threshold
+            self.stats["hits" if hit else "misses"] += 1
+            if hit:
+                self._entries.move_to_end(best_id)
+                entry = self._entries[best_id]
+        record_span(
+            self.name, time.perf_counter() - start, self.lab, hit=hit,
+            similarity=None if best_similarity is None else round(best_similarity, 4),
+        )
+        if not hit:
+            return None
+        return entry["response"], entry["metadata"], best_similarity
+
+    # Function to store a response, evicting the least recently used ones over the limit
+    def put(self, scope, response, embedding=None, metadata=None):
+        entry = {
+            "scope": scope,
+            "response": response,
+            "metadata": metadata or {},
+            "embedding": None if embedding is None else _unit_vector(embedding),
+            "created_at": time.time(),
+        }
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._scopes.setdefault(scope, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    # Function to remove every cached entry (e.g. after the index changes)
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        scope_ids = self._scopes[entry["scope"]]
+        scope_ids.discard(entry_id)
+        if not scope_ids:
+            del self._scopes[entry["scope"]]
+
+    def _evict_expired(self):
+        expired_before = time.time() - self.ttl_seconds
+        for entry_id in [entry_id for entry_id, entry in self._entries.items() if entry["created_at"] < expired_before]:
+            self._remove(entry_id)
+
+
+# NumPy is only imported once an embedding is cached or looked up, so pages that cache by
+# exact scope (Lab 5, the default page) do not pay for the import
+def _unit_vector(embedding):
+    import numpy as np
+
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
@@ -0,0 +1,133 @@
+import threading
+import time
+
+from bm25_index import BM25Index
+from document_loader import iter_document_chunks
+from ingestion import add_document_chunks
+from rag_pipeline import RagPipeline
+from tracing import span
+from vector_store import FlatVectorStore
+
+# Chunking settings for uploaded documents (the same as the Lab 4 corpus)
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 200
+
+# Chunks read from the upload before they are sent for embedding
+EMBED_GROUP_SIZE = 512
+
+# Indexes unused for this long are dropped, and at most this many are kept per process
+IDLE_SECONDS = 15 * 60
+MAX_SESSION_INDEXES = 100
+
+
+class DocumentIndex:
+    """In-memory chunk index of one uploaded document: exact vector search plus BM25."""
+
+    def __init__(self, fingerprint, name, collection, bm25_index, pipeline):
+        self.fingerprint = fingerprint
+        self.name = name
+        self.collection = collection
+        self.bm25_index = bm25_index
+        self.pipeline = pipeline
+        self.last_used = time.time()
+
+    # Function to count the indexed chunks
+    def count(self):
+        return self.collection.count()
+
+
+# Function to embed a group of chunks and add it to the index right away, so only one group's
+# embeddings are held as Python lists at a time
+def _index_group(collection, bm25_index, name, group, embedding_service, lab):
+    add_document_chunks(collection, bm25_index, name, group, embedding_service.embed([chunk["text"] for chunk in group]), lab)
+
+
+# Function to chunk, embed and index an upload in memory. Chunks are read lazily and each
+# group is embedded and indexed before the next one is read; returns a DocumentIndex whose
+# pipeline answers questions with only the passages relevant to them (pass `fingerprint` as
+# the pipeline's index version so cached query embeddings and results stay tied to this
+# document).
+def build_document_index(
+    file,
+    fingerprint,
+    embedding_service,
+    async_client,
+    rag_cache,
+    chat_model,
+    top_k,
+    token_budget,
+    lab="lab1",
+):
+    name = getattr(file, "name", None) or "upload"
+    collection = FlatVectorStore(None, fingerprint)
+    bm25_index = BM25Index()
+    with span("document_index", lab, embedding_service.model) as attributes:
+        chunk_count = 0
+        group = []
+        for chunk in iter_document_chunks(file, CHUNK_SIZE, CHUNK_OVERLAP):
+            group.append(chunk)
+            if len(group) >= EMBED_GROUP_SIZE:
+                _index_group(collection, bm25_index, name, group, embedding_service, lab)
+                chunk_count += len(group)
+                group = []
+        if group:
+            _index_group(collection, bm25_index, name, group, embedding_service, lab)
+            chunk_count += len(group)
+        attributes["chunks"] = chunk_count
+    pipeline = RagPipeline(
+        async_client, collection, bm25_index, rag_cache, chat_model, top_k, token_budget,
+        dimensions=embedding_service.dimensions, lab=lab,
+    )
+    return DocumentIndex(fingerprint, name, collection, bm25_index, pipeline)
+
+
+class SessionIndexes:
+    """Process-wide registry of per-session document indexes.
+
+    A session keeps one index: uploading another file replaces it, and indexes of sessions
+    that stay idle for `idle_seconds` are dropped on the next access from any session.
+    """
+
+    def __init__(self, idle_seconds=IDLE_SECONDS, max_indexes=MAX_SESSION_INDEXES):
+        self.idle_seconds = idle_seconds
+        self.max_indexes = max_indexes
+        self._indexes = {}  # session key -> DocumentIndex
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._indexes)
+
+    # Function to get a session's index if it is for the given document. The index of a
+    # previous upload is dropped straight away.
+    def get(self, session_key, fingerprint):
+        with self._lock:
+            self._evict_idle()
+            document_index = self._indexes.get(session_key)
+            if document_index is None:
+                return None
+            if document_index.fingerprint != fingerprint:
+                del self._indexes[session_key]
+                return None
+            document_index.last_used = time.time()
+            return document_index
+
+    # Function to store a session's index, replacing the one for its previous upload
+    def put(self, session_key, document_index):
+        with self._lock:
+            document_index.last_used = time.time()
+            self._indexes[session_key] = document_index
+            self._evict_idle()
+
+    # Function to drop a session's index
+    def evict(self, session_key):
+        with self._lock:
+            self._indexes.pop(session_key, None)
+
+    def _evict_idle(self):
+        now = time.time()
+        for session_key, document_index in list(self._indexes.items()):
+            if now - document_index.last_used > self.idle_seconds:
+                del self._indexes[session_key]
+        # Over the limit: drop the least recently used
+        while len(self._indexes) > self.max_indexes:
+            del self._indexes[min(self._indexes, key=lambda key: self._indexes[key].last_used)]
@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+import time
+
+from openai import AsyncOpenAI, OpenAI
+
+# How long a successful API key check is trusted before it is repeated
+KEY_CHECK_TTL_SECONDS = 60 * 60
+
+_lock = threading.Lock()
+_openai_clients = {}
+_async_openai_clients = {}
+_chroma_clients = {}
+_verified_keys = {}
+_creation_counts = {"openai": 0, "async_openai": 0, "chroma": 0}
+
+
+# Function to get the process-wide OpenAI client for an API key (and optional base URL).
+# OpenAI clients are thread-safe and pool their connections, so every session and page
+# shares one pool.
+def get_openai_client(api_key, base_url=None):
+    key = (api_key, base_url)
+    with _lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url)
+            _openai_clients[key] = client
+            _creation_counts["openai"] += 1
+        return client
+
+
+# Function to get the process-wide AsyncOpenAI client for an API key. Async clients are tied
+# to the event loop they first run on, so only use it from the shared background loop.
+def get_async_openai_client(api_key, base_url=None):
+    key = (api_key, base_url)
+    with _lock:
+        client = _async_openai_clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+            _async_openai_clients[key] = client
+            _creation_counts["async_openai"] += 1
+        return client
+
+
+# Function to check an API key once and remember the result for KEY_CHECK_TTL_SECONDS.
+# Raises the OpenAI error when the key is invalid; failures are not cached.
+def verify_openai_key(api_key):
+    with _lock:
+        verified_at = _verified_keys.get(api_key)
+    if verified_at is not None and time.time() - verified_at < KEY_CHECK_TTL_SECONDS:
+        return True
+    get_openai_client(api_key).models.list()
+    with _lock:
+        _verified_keys[api_key] = time.time()
+    return True
+
+
+# Function to swap in pysqlite3 when available (Streamlit Cloud ships an old sqlite3)
+def _use_pysqlite3():
+    if "pysqlite3" in sys.modules:
+        return
+    try:
+        __import__("pysqlite3")
+    except ImportError:
+        return
+    sys.modules["sqlite3"] = sys.modules.pop("pysqlite3")
+
+
+# Function to get the process-wide ChromaDB client for a storage folder.
+# Opening the same persistent folder twice in one process is wasteful and unsafe.
+def get_chroma_client(path):
+    path = os.path.abspath(path)
+    with _lock:
+        client = _chroma_clients.get(path)
+        if client is None:
+            _use_pysqlite3()
+            import chromadb
+
+            client = chromadb.PersistentClient(path=path)
+            _chroma_clients[path] = client
+            _creation_counts["chroma"] += 1
+        return client
+
+
+# Function to forget the ChromaDB client of a storage folder and close its files, before the
+# folder is deleted (e.g. a replaced index generation). Chroma shares one "system" (SQLite
+# connection, HNSW segments) per folder; stopping it is best effort, as it is not public API.
+def release_chroma_client(path):
+    path = os.path.abspath(path)
+    with _lock:
+        client = _chroma_clients.pop(path, None)
+    if client is None:
+        return
+    try:
+        from chromadb.api.client import SharedSystemClient
+
+        system = SharedSystemClient._identifer_to_system.pop(path, None)
+        if system is not None:
+            system.stop()
+    except Exception:
+        pass
+
+
+# Function to report how many clients this process has created
+def client_metrics():
+    with _lock:
+        return dict(_creation_counts)
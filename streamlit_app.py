@@ -1,11 +1,69 @@
+import os
+import sys
+import time
+
 import streamlit as st
 
+from tracing import record_span, start_metrics_server
+
 
+# Pages are only imported and executed when they are opened
 lab1 = st.Page("Lab1.py",title="Lab 1")
 lab2 = st.Page("Lab2.py",title="Lab 2")
 lab3 = st.Page("Lab3.py",title="Lab 3")
 lab4 = st.Page("Lab4.py",title="Lab 4")
 lab5 = st.Page("Lab5.py",title="Lab 5", default=True)
-pg = st.navigation([lab1, lab2, lab3, lab4, lab5])
+pages = [lab1, lab2, lab3, lab4, lab5]
+
+# The admin page is hidden from the menu until it is opened with ?admin in the URL
+if "admin" in st.query_params:
+    st.session_state.show_admin = True
+if st.session_state.get("show_admin"):
+    pages.append(st.Page("Admin.py", title="Admin", url_path="admin"))
+
+
+# Function to expose the tracing metrics for Prometheus, once per server process. A port
+# that is already taken only costs the endpoint, not the app.
+@st.cache_resource
+def start_metrics(port):
+    try:
+        return start_metrics_server(port)
+    except OSError as error:
+        print(f"Metrics endpoint not started on port {port}: {error}", file=sys.stderr)
+        return None
+
+
+# Optionally expose the tracing metrics (LAB_METRICS_PORT=9464)
+if os.environ.get("LAB_METRICS_PORT"):
+    start_metrics(int(os.environ["LAB_METRICS_PORT"]))
+
+
+# Function to start the Lab 4 index warm-up once per server process, on a background thread
+@st.cache_resource
+def start_corpus_warm_up():
+    from corpus_index import get_corpus_index
+
+    api_key = st.secrets.get("openai_api_key")
+    return get_corpus_index(api_key) if api_key else None
+
+
+# Function to remember which pages already ran in this process (the first run is the cold one)
+@st.cache_resource
+def pages_started():
+    return set()
+
+
+start_corpus_warm_up()
+pg = st.navigation(pages)
 st.set_page_config(page_title="Labs Manager")
-pg.run()
\ No newline at end of file
+
+# Record how long each page run takes; the first run in this process (imports and all) is
+# recorded separately as the page's cold start
+lab = pg.title.lower().replace(" ", "")
+span_name = "page_run" if lab in pages_started() else "page_cold_start"
+pages_started().add(lab)
+start = time.perf_counter()
+try:
+    pg.run()
+finally:
+    record_span(span_name, time.perf_counter() - start, lab)
@@ -0,0 +1,155 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import chain
+
+from chunking import chunk_pages
+from context_builder import count_tokens
+from tracing import STREAM_USAGE, add_usage, span
+
+# Documents up to this size are summarized in a single request
+DIRECT_SUMMARY_MAX_TOKENS = 8000
+
+# Size of the sections a long document is split into (in characters, ~3000 tokens)
+SECTION_SIZE = 12000
+
+# Cheaper model used to summarize the individual sections
+MAP_MODEL = "gpt-4o-mini"
+MAP_MAX_TOKENS = 400
+MAX_WORKERS = 4
+
+# Number of section summaries and finished summaries kept in memory
+SECTION_CACHE_SIZE = 1000
+SUMMARY_CACHE_SIZE = 200
+
+MAP_PROMPT = (
+    "Summarize this section of a longer document. Keep the key facts, names, numbers and "
+    "conclusions; do not add an introduction.\n\nSection:\n{section}"
+)
+REDUCE_PROMPT = (
+    "Here are summaries of consecutive sections of a document:\n\n{summaries}\n\n---\n\n{instruction}"
+)
+
+
+class SummaryCache:
+    """Thread-safe LRU cache of summaries keyed by a hash of their inputs."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, summary):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared by every session: section summaries do not depend on the selected format,
+# and finished summaries are keyed by document, instruction and model
+section_cache = SummaryCache(SECTION_CACHE_SIZE)
+summary_cache = SummaryCache(SUMMARY_CACHE_SIZE)
+
+
+# Function to summarize one section with the cheaper model (cached by content hash)
+def summarize_section(client, section_text, model=MAP_MODEL, lab=None):
+    key = section_cache.key(model, section_text)
+    summary = section_cache.get(key)
+    if summary is None:
+        with span("summary_section", lab, model) as attributes:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": MAP_PROMPT.format(section=section_text)}],
+                max_tokens=MAP_MAX_TOKENS,
+            )
+            add_usage(attributes, response.usage)
+        summary = response.choices[0].message.content.strip()
+        section_cache.put(key, summary)
+    return summary
+
+
+# Function to summarize sections concurrently, returning the summaries in document order.
+# `sections` may be a lazy iterable: only a few sections are read ahead of the running
+# requests. `on_progress(done, total)` is called from the calling thread as each section
+# finishes (so it is safe to update Streamlit elements from it); `total` is None until
+# every section has been read.
+def summarize_sections(client, sections, model=MAP_MODEL, max_workers=MAX_WORKERS, on_progress=None, lab=None):
+    total = len(sections) if hasattr(sections, "__len__") else None
+    sections = iter(sections)
+    summaries = {}
+    pending = {}
+    submitted = 0
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            while not exhausted and len(pending) < max_workers * 2:
+                section = next(sections, None)
+                if section is None:
+                    exhausted = True
+                    total = submitted
+                    break
+                pending[pool.submit(summarize_section, client, section, model, lab)] = submitted
+                submitted += 1
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                summaries[pending.pop(future)] = future.result()
+                if on_progress:
+                    on_progress(len(summaries), total)
+    return [summaries[index] for index in range(len(summaries))]
+
+
+# Function to stream the final summary request
+def _stream_final_summary(client, content, model):
+    return client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": content}],
+        stream=True,
+        stream_options=STREAM_USAGE,
+    )
+
+
+# Function to summarize a document in the requested format and return a streaming response.
+# The document is given as a (possibly lazy) iterable of section texts, e.g. from
+# document_loader.iter_document_chunks(file, SECTION_SIZE, 0), and sections are only read as
+# the map step needs them, so the full text is never held in memory. Short documents go
+# straight to `model`; long ones are summarized section by section with MAP_MODEL first
+# (map), and the section summaries are then combined into the requested format by `model`
+# (reduce). The stream ends with a usage chunk (see tracing.trace_chat_stream).
+def stream_sections_summary(client, sections, instruction, model, on_progress=None, lab=None):
+    sections = iter(sections)
+    head = []
+    head_tokens = 0
+    for section in sections:
+        head.append(section)
+        head_tokens += count_tokens(section, model)
+        if head_tokens > DIRECT_SUMMARY_MAX_TOKENS:
+            break
+    else:
+        # The whole document is short: summarize it in a single request
+        document = "\n".join(head)
+        return _stream_final_summary(client, f"Here's a document: {document} \n\n---\n\n {instruction}", model)
+
+    text = "\n\n".join(summarize_sections(client, chain(head, sections), on_progress=on_progress, lab=lab))
+    # Repeat the map step until the combined summaries are small enough to reduce at once
+    while count_tokens(text, model) > DIRECT_SUMMARY_MAX_TOKENS:
+        summary_sections = [chunk["text"] for chunk in chunk_pages([text], SECTION_SIZE, 0)]
+        if len(summary_sections) <= 1:
+            break
+        text = "\n\n".join(summarize_sections(client, summary_sections, on_progress=on_progress, lab=lab))
+    return _stream_final_summary(client, REDUCE_PROMPT.format(summaries=text, instruction=instruction), model)
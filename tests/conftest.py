@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# The app modules live at the top of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# Fixture: the local fake OpenAI API from the benchmarks, answering without delay
+@pytest.fixture
+def fake_openai():
+    from benchmarks.fake_openai import start_server
+
+    server = start_server(latency=0, tokens_per_second=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# Fixture: an OpenAI client for the fake API. The SDK's own retries are off, so the app's
+# retry logic is what is tested.
+@pytest.fixture
+def openai_client(fake_openai):
+    from openai import OpenAI
+
+    return OpenAI(api_key="test-key", base_url=fake_openai.base_url, max_retries=0)
+
+
+# Fixture: spans recorded while testing go to a temporary trace file, not the repository
+@pytest.fixture(autouse=True)
+def trace_file(tmp_path, monkeypatch):
+    import tracing
+
+    path = str(tmp_path / "traces.jsonl")
+    monkeypatch.setattr(tracing, "TRACE_FILE", path)
+    yield path
+    tracing.flush_spans()
@@ -0,0 +1,38 @@
+import os
+
+from bm25_index import BM25Index
+
+
+def build_index():
+    index = BM25Index()
+    index.add("a.pdf#0", "IST 652 scripting for data analysis", {"filename": "a.pdf", "page": 1})
+    index.add("a.pdf#1", "grading policy and late submissions", {"filename": "a.pdf", "page": 2})
+    index.add("b.pdf#0", "IST 736 text mining syllabus", {"filename": "b.pdf", "page": 1})
+    return index
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build_index()
+    path = os.path.join(tmp_path, "bm25_index.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert len(loaded) == len(index)
+    assert loaded.doc_metadata == index.doc_metadata
+    for query in ("IST 652", "grading", "text mining syllabus"):
+        assert loaded.search(query) == index.search(query)
+
+
+def test_loaded_index_can_remove_files(tmp_path):
+    path = os.path.join(tmp_path, "bm25_index.json")
+    build_index().save(path)
+    loaded = BM25Index.load(path)
+    loaded.remove_file("a.pdf")
+    assert [doc_id for doc_id, _ in loaded.search("IST grading")] == ["b.pdf#0"]
+
+
+def test_load_missing_or_corrupt_file_gives_empty_index(tmp_path):
+    path = os.path.join(tmp_path, "bm25_index.json")
+    assert len(BM25Index.load(path)) == 0
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("{not json")
+    assert len(BM25Index.load(path)) == 0
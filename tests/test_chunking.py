@@ -0,0 +1,39 @@
+import pytest
+
+from chunking import chunk_pages, iter_chunks
+
+PAGES = [
+    "Course overview. " * 40,
+    "",
+    "Grading: labs 50%, project 30%, exam 20%. " * 25,
+    "Office hours are on Tuesdays. " * 3,
+]
+
+
+# Function to feed pages to iter_chunks in pieces of `piece_size` characters
+def pieces(pages, piece_size):
+    for page_number, text in enumerate(pages, start=1):
+        if not text:
+            yield page_number, text
+        for start in range(0, len(text), piece_size):
+            yield page_number, text[start:start + piece_size]
+
+
+@pytest.mark.parametrize("piece_size", [1, 7, 100, 10_000])
+def test_iter_chunks_matches_chunk_pages(piece_size):
+    expected = chunk_pages(PAGES, chunk_size=300, overlap=50)
+    assert list(iter_chunks(pieces(PAGES, piece_size), chunk_size=300, overlap=50)) == expected
+
+
+def test_chunk_pages_tracks_pages_and_offsets():
+    document = "".join(PAGES)
+    chunks = chunk_pages(PAGES, chunk_size=300, overlap=50)
+    assert [chunk["chunk_index"] for chunk in chunks] == list(range(len(chunks)))
+    assert chunks[0]["page"] == 1 and chunks[-1]["page_end"] == 4
+    for chunk in chunks:
+        assert chunk["text"] == document[chunk["start_offset"]:chunk["end_offset"]].strip()
+
+
+def test_iter_chunks_rejects_overlap_not_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        list(iter_chunks([(1, "text")], chunk_size=100, overlap=100))
@@ -0,0 +1,43 @@
+from context_builder import build_context, context_budget, count_tokens
+
+
+def passage(text, filename="a.pdf", start=None):
+    result = {"text": text, "filename": filename}
+    if start is not None:
+        result.update(start_offset=start, end_offset=start + len(text))
+    return result
+
+
+def test_identical_and_overlapping_passages_are_skipped():
+    passages = [
+        passage("The final exam is on May 5. " * 4, start=0),
+        passage("The final exam is on May 5. " * 4, filename="b.pdf"),
+        passage("exam is on May 5. " * 5, start=20),  # mostly inside the first passage
+        passage("Labs are due on Fridays.", start=400),
+    ]
+    context = build_context(passages, budget=1000)
+    assert [kept["text"] for kept in context["passages"]] == [passages[0]["text"], passages[3]["text"]]
+    assert context["duplicates"] == 2 and context["dropped_passages"] == 0
+
+
+def test_passages_beyond_the_budget_are_dropped_in_rank_order():
+    texts = [f"Passage number {index} about grading and attendance rules." for index in range(5)]
+    separator_tokens = count_tokens("\n\n")
+    budget = sum(count_tokens(text) for text in texts[:2]) + separator_tokens
+    context = build_context([passage(text) for text in texts], budget=budget)
+    assert [kept["text"] for kept in context["passages"]] == texts[:2]
+    assert context["text"] == "\n\n".join(texts[:2])
+    assert context["tokens"] == budget
+    assert context["dropped_passages"] == 3
+    assert context["dropped_tokens"] == sum(count_tokens(text) for text in texts[2:])
+
+
+def test_smaller_passages_still_fill_the_budget_after_a_large_one():
+    small, large = "Short answer.", "Long passage. " * 200
+    context = build_context([passage(large), passage(small, filename="b.pdf")], budget=count_tokens(small))
+    assert [kept["text"] for kept in context["passages"]] == [small]
+
+
+def test_context_budget_leaves_room_for_the_answer():
+    assert context_budget("gpt-4o") < 128_000
+    assert context_budget("gpt-4o", max_tokens=3000) == 3000
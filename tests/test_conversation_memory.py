@@ -0,0 +1,43 @@
+import time
+
+from context_builder import count_tokens
+from conversation_memory import ConversationMemory
+
+
+# Function to wait until no summary refresh is running
+def wait_for_summary(memory, timeout=10):
+    deadline = time.time() + timeout
+    while memory._pending is not None and time.time() < deadline:
+        time.sleep(0.01)
+    assert memory._pending is None
+
+
+def turn_text(index):
+    return f"Turn {index}: a question about the syllabus and the weekly readings."
+
+
+def test_short_conversation_is_sent_verbatim(fake_openai, openai_client):
+    memory = ConversationMemory(openai_client, window_token_budget=1000)
+    for index in range(4):
+        memory.add("user" if index % 2 == 0 else "assistant", turn_text(index))
+    assert memory.context_messages() == memory.messages
+    assert memory.summary == "" and "chat" not in fake_openai.counters
+
+
+def test_turns_leaving_the_window_roll_into_the_summary(fake_openai, openai_client):
+    budget = 2 * count_tokens(turn_text(0))
+    memory = ConversationMemory(openai_client, window_token_budget=budget)
+    for index in range(6):
+        memory.add("user" if index % 2 == 0 else "assistant", turn_text(index))
+        wait_for_summary(memory)
+    assert memory.summary and memory.summarized_count == 4
+    context = memory.context_messages()
+    assert context[0]["role"] == "system" and memory.summary in context[0]["content"]
+    assert context[1:] == memory.messages[4:]
+    assert sum(count_tokens(message["content"]) for message in context[1:]) <= budget
+
+
+def test_latest_turn_is_kept_even_over_budget(openai_client):
+    memory = ConversationMemory(openai_client, window_token_budget=5)
+    memory.add("user", "A long question that does not fit the tiny window budget at all.")
+    assert memory.context_messages() == memory.messages
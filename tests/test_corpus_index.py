@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+import corpus_index
+from bm25_index import BM25Index
+from corpus_index import CHUNK_OVERLAP, CHUNK_SIZE, COLLECTION_NAME, GENERATIONS_FOLDER, CorpusIndex, live_index_path
+from document_index import index_version, load_manifest, plan_ingestion, save_manifest
+from ingestion import ingestion_signature
+from vector_store import open_vector_store
+
+STORE_CONFIG = {"backend": "flat"}
+
+
+# Function to stand in for CorpusIndex._ingest without the OpenAI API: one fake chunk per
+# changed PDF, and the manifest saved like ingest_folder does
+def fake_ingest(path, collection, bm25_index, pdf_folder, fail=False):
+    if fail:
+        raise RuntimeError("embedding failed")
+    signature = ingestion_signature(CHUNK_SIZE, CHUNK_OVERLAP, STORE_CONFIG)
+    changed, removed, manifest = plan_ingestion(pdf_folder, load_manifest(path), signature=signature)
+    for pdf_file in changed:
+        metadata = {"filename": pdf_file}
+        collection.upsert(ids=[f"{pdf_file}#0"], embeddings=[[1.0, 0.0]], documents=[pdf_file], metadatas=[metadata])
+        bm25_index.add(f"{pdf_file}#0", pdf_file, metadata)
+    manifest.update(changed)
+    save_manifest(path, manifest)
+    return {"index_version": index_version(manifest), "errors": {}, "extraction_timings": {}}
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    pdf_folder = os.path.join(tmp_path, "pdfs")
+    db_path = os.path.join(tmp_path, "chroma_storage")
+    os.makedirs(pdf_folder)
+    monkeypatch.setattr(corpus_index, "VECTOR_STORE_CONFIG", STORE_CONFIG)
+    corpus = CorpusIndex("test-key", pdf_folder, db_path, watch_interval=None)
+    corpus.fail_ingest = False
+    monkeypatch.setattr(corpus, "_ingest", lambda path, collection, bm25_index: fake_ingest(
+        path, collection, bm25_index, pdf_folder, corpus.fail_ingest
+    ))
+    # The live index starts out in db_path itself, as after a first warm-up
+    collection = open_vector_store(db_path, COLLECTION_NAME, STORE_CONFIG)
+    bm25_index = BM25Index()
+    result = fake_ingest(db_path, collection, bm25_index, pdf_folder)
+    corpus._live = {
+        "collection": collection,
+        "bm25_index": bm25_index,
+        "index_version": result["index_version"],
+        "path": db_path,
+        "updated_at": 0,
+    }
+    return corpus
+
+
+def add_pdf(corpus, name, content):
+    with open(os.path.join(corpus.pdf_folder, name), "wb") as file:
+        file.write(content)
+
+
+def generations(corpus):
+    path = os.path.join(corpus.db_path, GENERATIONS_FOLDER)
+    return sorted(os.path.join(path, name) for name in os.listdir(path)) if os.path.isdir(path) else []
+
+
+def test_reindex_swaps_in_a_staging_index(corpus):
+    assert corpus.reindex() is False
+    first_version = corpus.index_version
+    add_pdf(corpus, "a.pdf", b"a")
+    assert corpus.reindex() is True
+    live = corpus.snapshot()
+    assert live["index_version"] != first_version
+    assert live["path"] in generations(corpus)
+    assert live_index_path(corpus.db_path) == live["path"]
+    assert live["collection"].get(include=[])["ids"] == ["a.pdf#0"]
+    # The replaced index (here the original folder, which is never deleted) is retired
+    assert corpus._retired_path == corpus.db_path
+
+
+def test_retired_index_is_deleted_at_the_next_swap(corpus):
+    add_pdf(corpus, "a.pdf", b"a")
+    corpus.reindex()
+    first_generation = corpus.snapshot()["path"]
+    add_pdf(corpus, "b.pdf", b"b")
+    corpus.reindex()
+    second_generation = corpus.snapshot()["path"]
+    # Sessions may still be reading the index replaced last, so it is kept for one more swap
+    assert corpus._retired_path == first_generation and os.path.isdir(first_generation)
+    add_pdf(corpus, "c.pdf", b"c")
+    corpus.reindex()
+    assert not os.path.exists(first_generation)
+    assert corpus._retired_path == second_generation and os.path.isdir(second_generation)
+    assert generations(corpus) == sorted([second_generation, corpus.snapshot()["path"]])
+    assert sorted(corpus.collection.get(include=[])["ids"]) == ["a.pdf#0", "b.pdf#0", "c.pdf#0"]
+    assert os.path.isdir(corpus.db_path)
+
+
+def test_failed_reindex_keeps_the_live_index(corpus):
+    live = corpus.snapshot()
+    add_pdf(corpus, "a.pdf", b"a")
+    corpus.fail_ingest = True
+    with pytest.raises(RuntimeError):
+        corpus.reindex()
+    assert corpus.snapshot() is live
+    assert generations(corpus) == []
+    assert live_index_path(corpus.db_path) == corpus.db_path
+
+
+def test_stale_generations_are_removed(corpus):
+    add_pdf(corpus, "a.pdf", b"a")
+    corpus.reindex()
+    live_path = corpus.snapshot()["path"]
+    stale_path = os.path.join(corpus.db_path, GENERATIONS_FOLDER, "0")
+    os.makedirs(stale_path)
+    corpus._remove_stale_generations(live_path)
+    assert generations(corpus) == [live_path]
@@ -0,0 +1,70 @@
+import os
+
+from document_index import plan_ingestion
+
+
+def write_pdf(folder, name, content, mtime=None):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as file:
+        file.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+# Function to plan against an empty manifest and return the resulting manifest
+def first_manifest(folder, signature="v1"):
+    changed, removed, manifest = plan_ingestion(folder, {}, signature=signature)
+    assert removed == [] and manifest == {}
+    return dict(changed)
+
+
+def test_new_files_are_changed(tmp_path):
+    write_pdf(tmp_path, "a.pdf", b"a")
+    write_pdf(tmp_path, "notes.txt", b"not a pdf")
+    assert sorted(first_manifest(tmp_path)) == ["a.pdf"]
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    write_pdf(tmp_path, "a.pdf", b"a")
+    manifest = first_manifest(tmp_path)
+    changed, removed, updated = plan_ingestion(tmp_path, manifest, signature="v1")
+    assert changed == {} and removed == [] and updated == manifest
+
+
+def test_touched_but_identical_files_are_skipped(tmp_path):
+    path = write_pdf(tmp_path, "a.pdf", b"a", mtime=1_000_000)
+    manifest = first_manifest(tmp_path)
+    os.utime(path, (2_000_000, 2_000_000))
+    changed, removed, updated = plan_ingestion(tmp_path, manifest, signature="v1")
+    assert changed == {} and removed == []
+    assert updated["a.pdf"]["mtime"] == 2_000_000
+
+
+def test_modified_and_removed_files_are_detected(tmp_path):
+    write_pdf(tmp_path, "a.pdf", b"a", mtime=1_000_000)
+    write_pdf(tmp_path, "b.pdf", b"b")
+    manifest = first_manifest(tmp_path)
+    write_pdf(tmp_path, "a.pdf", b"a, second edition", mtime=2_000_000)
+    os.remove(os.path.join(tmp_path, "b.pdf"))
+    changed, removed, updated = plan_ingestion(tmp_path, manifest, signature="v1")
+    assert list(changed) == ["a.pdf"] and changed["a.pdf"]["sha256"] != manifest["a.pdf"]["sha256"]
+    assert removed == ["b.pdf"]
+    assert updated == {}
+
+
+def test_other_settings_or_missing_chunks_are_re_ingested(tmp_path):
+    write_pdf(tmp_path, "a.pdf", b"a")
+    write_pdf(tmp_path, "b.pdf", b"b")
+    manifest = first_manifest(tmp_path)
+    changed, _, _ = plan_ingestion(tmp_path, manifest, signature="v2")
+    assert sorted(changed) == ["a.pdf", "b.pdf"]
+    changed, _, _ = plan_ingestion(tmp_path, manifest, indexed_files={"a.pdf"}, signature="v1")
+    assert list(changed) == ["b.pdf"]
+
+
+def test_indexed_files_gone_from_disk_are_removed_without_a_manifest_entry(tmp_path):
+    write_pdf(tmp_path, "b.pdf", b"b")
+    manifest = first_manifest(tmp_path)
+    changed, removed, _ = plan_ingestion(tmp_path, manifest, indexed_files={"a.pdf", "b.pdf"}, signature="v1")
+    assert changed == {} and removed == ["a.pdf"]
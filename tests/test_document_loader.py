@@ -0,0 +1,38 @@
+import io
+
+from document_loader import document_fingerprint, get_fingerprint, iter_document_chunks
+
+
+def upload(content, name="notes.txt", file_id=None):
+    file = io.BytesIO(content)
+    file.name = name
+    file.size = len(content)
+    file.file_id = file_id
+    return file
+
+
+def test_fingerprint_is_computed_once_per_upload(monkeypatch):
+    import document_loader
+
+    calls = []
+    monkeypatch.setattr(document_loader, "document_fingerprint", lambda file: calls.append(file) or f"hash {len(calls)}")
+    session_state = {}
+    first = upload(b"first", file_id="1")
+    assert get_fingerprint(first, session_state) == "hash 1"
+    assert get_fingerprint(first, session_state) == "hash 1"
+    assert get_fingerprint(upload(b"second", file_id="2"), session_state) == "hash 2"
+    assert len(calls) == 2
+
+
+def test_fingerprint_depends_on_content_and_rewinds():
+    file = upload(b"same text")
+    assert document_fingerprint(file) == document_fingerprint(upload(b"same text"))
+    assert document_fingerprint(file) != document_fingerprint(upload(b"other text"))
+    assert file.tell() == 0
+
+
+def test_text_upload_is_chunked_from_the_start():
+    file = upload(("word " * 1000).encode("utf-8"))
+    document_fingerprint(file)
+    chunks = list(iter_document_chunks(file, 300, 50))
+    assert chunks[0]["start_offset"] == 0 and chunks[-1]["end_offset"] == 5000
@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pytest
+from openai import RateLimitError
+
+from benchmarks.fake_openai import fake_embedding
+from context_builder import count_tokens
+from embeddings import EMBEDDING_MODEL, REQUEST_TOKEN_MARGIN, EmbeddingService, pack_batches
+
+
+# Function to compare embeddings with what the fake API sends (as float32)
+def assert_embeddings(embeddings, texts):
+    assert len(embeddings) == len(texts)
+    for embedding, text in zip(embeddings, texts):
+        assert np.allclose(embedding, fake_embedding(text), atol=1e-6)
+
+
+def test_pack_batches_respects_input_and_token_limits():
+    texts = [f"chunk {index} " * 50 for index in range(10)]
+    batches = pack_batches(texts, max_inputs=3)
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+    assert sorted(index for batch in batches for index in batch) == list(range(10))
+    # A limit of 3.5 texts' worth of tokens after the safety margin fits three texts, not four
+    text_tokens = count_tokens(texts[0], EMBEDDING_MODEL)
+    max_tokens = math.ceil(3.5 * text_tokens / REQUEST_TOKEN_MARGIN)
+    assert [len(batch) for batch in pack_batches(texts, max_tokens=max_tokens)] == [3, 3, 3, 1]
+
+
+def test_pack_batches_keeps_oversized_texts_in_their_own_batch():
+    assert pack_batches(["short", "long " * 1000, "short"], max_tokens=100) == [[0], [1], [2]]
+
+
+def test_embed_preserves_order_across_concurrent_batches(fake_openai, openai_client):
+    service = EmbeddingService(openai_client, max_inputs=4, max_workers=3)
+    texts = [f"passage {index}" for index in range(10)]
+    assert_embeddings(service.embed(texts), texts)
+    assert service.request_count == 3 and fake_openai.counters["embeddings"] == 3
+
+
+def test_embed_replaces_empty_texts(openai_client):
+    assert_embeddings(EmbeddingService(openai_client).embed([""]), [" "])
+
+
+def test_embed_retries_rate_limits(fake_openai, openai_client):
+    fake_openai.forced_rate_limits = 2
+    service = EmbeddingService(openai_client, backoff_seconds=0.01)
+    assert_embeddings(service.embed(["retried"]), ["retried"])
+    assert service.request_count == 3 and fake_openai.counters["rate_limited"] == 2
+
+
+def test_embed_gives_up_after_max_retries(fake_openai, openai_client):
+    fake_openai.forced_rate_limits = 5
+    service = EmbeddingService(openai_client, max_retries=1, backoff_seconds=0.01)
+    with pytest.raises(RateLimitError):
+        service.embed(["never"])
+    assert service.request_count == 2
@@ -0,0 +1,45 @@
+import os
+import shutil
+
+from bm25_index import BM25Index
+from document_index import load_manifest
+from ingestion import indexed_filenames, ingest_folder
+from vector_store import open_vector_store
+
+PDF_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_lab4")
+
+
+class FakeEmbeddingService:
+    def embed(self, texts):
+        return [[1.0, float(len(text) % 7)] for text in texts]
+
+
+def ingest(pdf_folder, db_path, collection, bm25_index):
+    return ingest_folder(pdf_folder, db_path, collection, bm25_index, FakeEmbeddingService(), 1500, 200, signature="test")
+
+
+def test_pdf_that_failed_to_reingest_is_removed_once_deleted(tmp_path):
+    pdf_folder = os.path.join(tmp_path, "pdfs")
+    db_path = os.path.join(tmp_path, "store")
+    os.makedirs(pdf_folder)
+    sample_pdfs = sorted(name for name in os.listdir(PDF_FOLDER) if name.endswith(".pdf"))[:2]
+    for name, target in zip(sample_pdfs, ("a.pdf", "b.pdf")):
+        shutil.copy(os.path.join(PDF_FOLDER, name), os.path.join(pdf_folder, target))
+    collection = open_vector_store(db_path, "test", {"backend": "flat"})
+    bm25_index = BM25Index()
+    result = ingest(pdf_folder, db_path, collection, bm25_index)
+    assert result["errors"] == {} and indexed_filenames(collection) == {"a.pdf", "b.pdf"}
+
+    # a.pdf is replaced by a corrupt file: it fails, keeps its old chunks, loses its manifest entry
+    with open(os.path.join(pdf_folder, "a.pdf"), "wb") as file:
+        file.write(b"not a pdf any more")
+    result = ingest(pdf_folder, db_path, collection, bm25_index)
+    assert list(result["errors"]) == ["a.pdf"]
+    assert "a.pdf" not in load_manifest(db_path) and "a.pdf" in indexed_filenames(collection)
+
+    # Deleting it must still drop its chunks from the collection and the BM25 index
+    os.remove(os.path.join(pdf_folder, "a.pdf"))
+    result = ingest(pdf_folder, db_path, collection, bm25_index)
+    assert result["removed"] == ["a.pdf"]
+    assert indexed_filenames(collection) == {"b.pdf"}
+    assert {metadata["filename"] for metadata in bm25_index.doc_metadata.values()} == {"b.pdf"}
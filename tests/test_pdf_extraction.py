@@ -0,0 +1,39 @@
+import os
+import shutil
+
+import pytest
+
+from pdf_extraction import iter_extracted_pdfs
+
+PDF_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_lab4")
+
+
+def sample_pdf(tmp_path):
+    name = sorted(name for name in os.listdir(PDF_FOLDER) if name.endswith(".pdf"))[0]
+    return shutil.copy(os.path.join(PDF_FOLDER, name), os.path.join(tmp_path, "ok.pdf"))
+
+
+def test_corrupt_pdf_gives_an_error_result(tmp_path):
+    broken_path = os.path.join(tmp_path, "broken.pdf")
+    with open(broken_path, "wb") as file:
+        file.write(b"not a pdf")
+    ok_path = sample_pdf(tmp_path)
+    results = {result["path"]: result for result in iter_extracted_pdfs([broken_path, ok_path], max_workers=2)}
+    assert results[broken_path]["pages"] is None and results[broken_path]["error"]
+    assert results[ok_path]["error"] is None and results[ok_path]["pages"]
+
+
+# A FIFO nobody writes to blocks the reader forever, like a PDF the parser hangs on
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_stuck_pdf_times_out_without_holding_up_the_others(tmp_path, max_workers):
+    hang_path = os.path.join(tmp_path, "hang.pdf")
+    os.mkfifo(hang_path)
+    ok_path = sample_pdf(tmp_path)
+    results = {
+        result["path"]: result
+        for result in iter_extracted_pdfs([hang_path, ok_path], max_workers=max_workers, timeout_seconds=2)
+    }
+    assert results[hang_path]["pages"] is None
+    assert results[hang_path]["error"] == "Timed out after 2 seconds"
+    assert results[ok_path]["error"] is None and results[ok_path]["pages"]
@@ -0,0 +1,43 @@
+import time
+
+from rag_cache import RagCache, cache_key
+
+
+def test_cache_key_ignores_case_spacing_and_punctuation():
+    assert cache_key("Who teaches IST 652?", "v1") == cache_key("  who teaches   ist 652 ", "v1")
+    assert cache_key("Who teaches IST 652?", "v1") != cache_key("Who teaches IST 652?", "v2")
+
+
+def test_answers_expire_after_the_ttl(monkeypatch):
+    cache = RagCache(":memory:", answer_ttl_seconds=60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.put_answer("question", "answer", {"passages": []})
+    assert cache.get_answer("question") == ("answer", {"passages": []})
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get_answer("question") is None
+    assert cache.stats["answer_hits"] == 1 and cache.stats["answer_misses"] == 1
+
+
+def test_least_recently_used_answers_are_evicted(monkeypatch):
+    cache = RagCache(":memory:", max_answers=2)
+    clock = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    cache.put_answer("first", "1")
+    cache.put_answer("second", "2")
+    # Reading "first" makes "second" the least recently used
+    assert cache.get_answer("first") == ("1", {})
+    cache.put_answer("third", "3")
+    assert cache.get_answer("second") is None
+    assert cache.get_answer("first") == ("1", {})
+    assert cache.get_answer("third") == ("3", {})
+
+
+def test_query_cache_keeps_the_newest_entries(monkeypatch):
+    cache = RagCache(":memory:", max_queries=2)
+    clock = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    for index in range(3):
+        cache.put_query(f"query {index}", [0.1 * index], [f"doc {index}"])
+    assert cache.get_query("query 0") is None
+    assert cache.get_query("query 2") == ([0.2], ["doc 2"])
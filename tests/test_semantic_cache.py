@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+
+from semantic_cache import SemanticCache, bucket
+
+
+BASE = [1.0, 0.0, 0.0, 0.0]
+
+
+# Function to get a unit vector at `angle` radians from BASE (cosine similarity cos(angle))
+def rotated(angle):
+    return [np.cos(angle), np.sin(angle), 0.0, 0.0]
+
+
+def test_similar_embeddings_hit_only_above_the_threshold():
+    cache = SemanticCache(threshold=0.9)
+    cache.put("scope", "answer", BASE, {"passages": []})
+    response, metadata, similarity = cache.get("scope", rotated(0.3))  # cosine 0.955
+    assert (response, metadata) == ("answer", {"passages": []}) and similarity > 0.9
+    assert cache.get("scope", rotated(0.6)) is None  # cosine 0.825
+    assert cache.stats == {"hits": 1, "misses": 1} and cache.hit_rate() == 0.5
+
+
+def test_the_most_similar_entry_wins():
+    cache = SemanticCache(threshold=0.5)
+    cache.put("scope", "far", rotated(0.8))
+    cache.put("scope", "near", rotated(0.1))
+    assert cache.get("scope", BASE)[0] == "near"
+
+
+def test_scopes_are_kept_apart():
+    cache = SemanticCache()
+    cache.put(("v1", "gpt-4o", ("652",)), "IST 652 answer", BASE)
+    assert cache.get(("v1", "gpt-4o", ("736",)), BASE) is None
+    assert cache.get(("v2", "gpt-4o", ("652",)), BASE) is None
+    assert cache.get(("v1", "gpt-4o", ("652",)), BASE)[0] == "IST 652 answer"
+
+
+def test_exact_scope_entries_without_embeddings():
+    cache = SemanticCache()
+    cache.put(("syracuse", bucket(20.4, 2)), "a light jacket")
+    assert cache.get(("syracuse", bucket(19.6, 2)))[0] == "a light jacket"
+    assert cache.get(("syracuse", bucket(25.0, 2))) is None
+
+
+def test_entries_expire_and_clear_invalidates(monkeypatch):
+    cache = SemanticCache(ttl_seconds=60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.put("scope", "answer", BASE)
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("scope", BASE) is None and len(cache) == 0
+    cache.put("scope", "answer", BASE)
+    cache.clear()
+    assert cache.get("scope", BASE) is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SemanticCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a")[0] == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None and cache.get("a")[0] == "A" and cache.get("c")[0] == "C"
@@ -0,0 +1,38 @@
+import json
+
+import tracing
+
+
+def test_spans_are_written_in_the_background(trace_file):
+    tracing.record_span("lookup", 0.25, "lab4", hit=True, similarity=None)
+    tracing.flush_spans()
+    [record] = tracing.load_spans(path=trace_file)
+    assert record["name"] == "lookup" and record["lab"] == "lab4" and record["hit"] is True
+    assert "similarity" not in record
+
+
+def test_unserializable_attributes_do_not_stop_the_writer(trace_file):
+    tracing.record_span("odd", 0.1, payload=object())
+    tracing.record_span("after", 0.1)
+    tracing.flush_spans()
+    names = [record["name"] for record in tracing.load_spans(path=trace_file)]
+    assert names == ["odd", "after"]
+
+
+def test_trace_file_is_rotated(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_FILE_MAX_BYTES", 200)
+    for index in range(3):
+        tracing.record_span("span", 0.1, index=index, padding="x" * 200)
+        tracing.flush_spans()
+    with open(trace_file + ".1", "r", encoding="utf-8") as file:
+        assert json.loads(file.read())["index"] == 1
+    assert [record["index"] for record in tracing.load_spans(path=trace_file)] == [2]
+
+
+def test_summarize_spans_reports_latency_and_hit_rate():
+    spans = [
+        {"name": "cache", "lab": "lab4", "model": None, "seconds": seconds, "hit": hit}
+        for seconds, hit in ((0.1, True), (0.2, False), (0.3, True), (0.4, True))
+    ]
+    [row] = tracing.summarize_spans(spans)
+    assert row["count"] == 4 and row["hit_rate"] == 0.75 and row["p50_ms"] in (200.0, 300.0)
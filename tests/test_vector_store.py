@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+import shared_clients
+from vector_store import (
+    DEFAULT_STORE_CONFIG,
+    FlatVectorStore,
+    chroma_metadata,
+    copy_collection,
+    open_vector_store,
+    quantize_int8,
+    store_signature,
+)
+
+
+def unit_vectors(count, dimensions=32, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(store, vectors):
+    store.upsert(
+        ids=[f"doc{index}" for index in range(len(vectors))],
+        embeddings=vectors.tolist(),
+        documents=[f"text {index}" for index in range(len(vectors))],
+        metadatas=[{"filename": "a.pdf" if index % 2 else "b.pdf"} for index in range(len(vectors))],
+    )
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8"])
+def test_query_finds_the_nearest_vectors(quantization):
+    vectors = unit_vectors(200)
+    store = FlatVectorStore(None, "test", quantization)
+    fill(store, vectors)
+    result = store.query(query_embeddings=vectors[:5].tolist(), n_results=3)
+    for index, (ids, distances) in enumerate(zip(result["ids"], result["distances"])):
+        assert ids[0] == f"doc{index}"
+        assert distances[0] == pytest.approx(0.0, abs=0.02)
+        assert distances == sorted(distances)
+
+
+def test_int8_quantization_keeps_vectors_close():
+    vectors = unit_vectors(50)
+    quantized, scales = quantize_int8(vectors)
+    assert quantized.dtype == np.int8
+    assert np.allclose(quantized * scales[:, None], vectors, atol=0.01)
+
+
+def test_upsert_replaces_existing_ids_and_delete_by_filename():
+    vectors = unit_vectors(10)
+    store = FlatVectorStore(None, "test")
+    fill(store, vectors)
+    store.upsert(ids=["doc1", "doc10"], embeddings=vectors[:2].tolist(), documents=["new 1", "new 10"])
+    assert store.count() == 11
+    assert store.get(ids=["doc1"])["documents"] == ["new 1"]
+    assert np.allclose(store.get(ids=["doc1"], include=["embeddings"])["embeddings"][0], vectors[0])
+    store.delete(where={"filename": "b.pdf"})
+    assert sorted(store.get(include=[])["ids"]) == sorted(["doc1", "doc3", "doc5", "doc7", "doc9", "doc10"])
+    assert store.query(query_embeddings=[vectors[3].tolist()], n_results=1)["ids"] == [["doc3"]]
+
+
+def test_store_is_written_on_flush_and_reopened(tmp_path):
+    vectors = unit_vectors(100)
+    store = FlatVectorStore(str(tmp_path), "test", "int8")
+    fill(store, vectors)
+    assert FlatVectorStore(str(tmp_path), "test", "int8").count() == 0
+    store.flush()
+    reopened = FlatVectorStore(str(tmp_path), "test", "int8")
+    assert reopened.get(include=[])["ids"] == store.get(include=[])["ids"]
+    assert reopened.query(query_embeddings=[vectors[7].tolist()], n_results=1)["ids"] == [["doc7"]]
+    # A store opened with other settings starts empty, so everything is re-embedded
+    assert FlatVectorStore(str(tmp_path), "test", "none").count() == 0
+
+
+def test_store_signature_merges_defaults():
+    assert store_signature({"backend": "chroma"}) == store_signature(DEFAULT_STORE_CONFIG)
+    assert store_signature({"backend": "flat", "quantization": "int8"}) != store_signature({"backend": "flat"})
+
+
+class FakeChromaCollection(FlatVectorStore):
+    def __init__(self, client, name, metadata):
+        super().__init__(None, name)
+        self.client, self.name, self.metadata = client, name, metadata
+
+    def modify(self, name=None):
+        self.client.collections[name] = self.client.collections.pop(self.name)
+        self.name = name
+
+
+class FakeChromaClient:
+    """The part of the Chroma client API open_vector_store uses, kept in memory."""
+
+    def __init__(self):
+        self.collections = {}
+
+    def list_collections(self):
+        return list(self.collections.values())
+
+    def create_collection(self, name, metadata=None):
+        assert name not in self.collections
+        self.collections[name] = FakeChromaCollection(self, name, metadata)
+        return self.collections[name]
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+
+@pytest.fixture
+def chroma_client(monkeypatch):
+    client = FakeChromaClient()
+    monkeypatch.setattr(shared_clients, "get_chroma_client", lambda path: client)
+    return client
+
+
+def test_chroma_collection_is_rebuilt_when_hnsw_settings_change(chroma_client):
+    vectors = unit_vectors(20)
+    collection = open_vector_store("unused", "docs", {"backend": "chroma"})
+    fill(collection, vectors)
+    assert open_vector_store("unused", "docs", {"backend": "chroma"}) is collection
+
+    config = {"backend": "chroma", "hnsw_ef_search": 100}
+    rebuilt = open_vector_store("unused", "docs", config)
+    assert rebuilt is not collection and list(chroma_client.collections) == ["docs"]
+    assert rebuilt.metadata == chroma_metadata(dict(DEFAULT_STORE_CONFIG, **config))
+    assert rebuilt.get(include=[])["ids"] == collection.get(include=[])["ids"]
+    assert rebuilt.query(query_embeddings=[vectors[4].tolist()], n_results=1)["ids"] == [["doc4"]]
+
+
+def test_chroma_collection_is_emptied_when_dimensions_change(chroma_client):
+    fill(open_vector_store("unused", "docs", {"backend": "chroma"}), unit_vectors(5))
+    resized = open_vector_store("unused", "docs", {"backend": "chroma", "dimensions": 256})
+    assert resized.count() == 0 and resized.metadata["lab:dimensions"] == 256
+
+
+def test_copy_collection_copies_in_batches():
+    source, target = FlatVectorStore(None, "source"), FlatVectorStore(None, "target")
+    fill(source, unit_vectors(25))
+    assert copy_collection(source, target, batch_size=10) == 25
+    assert target.get() == source.get()
+
+
+def test_real_chroma_collection_keeps_its_vectors_across_a_rebuild(tmp_path):
+    pytest.importorskip("chromadb")
+    vectors = unit_vectors(20)
+    fill(open_vector_store(str(tmp_path), "docs", {"backend": "chroma"}), vectors)
+    rebuilt = open_vector_store(str(tmp_path), "docs", {"backend": "chroma", "hnsw_ef_search": 100})
+    assert rebuilt.metadata["hnsw:search_ef"] == 100 and rebuilt.count() == 20
+    assert rebuilt.query(query_embeddings=[vectors[4].tolist()], n_results=1)["ids"] == [["doc4"]]
+    shared_clients.release_chroma_client(str(tmp_path))
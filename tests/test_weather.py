@@ -0,0 +1,49 @@
+import pytest
+
+from benchmarks.stub_weather import start_server
+from weather import WeatherError, WeatherProvider, normalize_city
+
+
+@pytest.fixture
+def weather_server():
+    server = start_server(latency=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def provider(weather_server):
+    return WeatherProvider("test-key", base_url=weather_server.base_url)
+
+
+def test_normalize_city():
+    assert normalize_city(" Syracuse, NY ") == "syracuse"
+    assert normalize_city("") == normalize_city(None) == "syracuse"
+
+
+@pytest.mark.parametrize("city, message", [("nowhere", "city not found"), ("ratelimited", "temporary blocked")])
+def test_response_without_main_raises_weather_error(provider, city, message):
+    with pytest.raises(WeatherError, match=message):
+        provider.get_current_weather(city)
+
+
+def test_weather_is_converted_and_cached(provider, weather_server):
+    weather = provider.get_current_weather("Boston, MA")
+    assert weather["location"] == "Boston" and -10 <= weather["temperature"] <= 30
+    assert provider.get_current_weather("boston") == weather
+    assert weather_server.requests_by_city == {"boston": 1}
+    assert provider.stats == {"hits": 1, "misses": 1}
+
+
+def test_cities_are_looked_up_together_with_errors_in_place(provider):
+    results = provider.get_weather_for_cities(["Paris", "nowhere", "Rome"])
+    assert list(results) == ["Paris", "nowhere", "Rome"]
+    assert isinstance(results["nowhere"], WeatherError)
+    assert results["Rome"]["location"] == "Rome"
+
+
+def test_unreachable_service_raises_weather_error():
+    provider = WeatherProvider("test-key", base_url="http://127.0.0.1:9/weather", timeout=(0.5, 0.5))
+    with pytest.raises(WeatherError, match="Could not reach"):
+        provider.get_current_weather("Paris")
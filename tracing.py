@@ -0,0 +1,241 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Spans are appended to this JSONL file (set LAB_TRACE_FILE to move it, or to "" to disable)
+TRACE_FILE = os.environ.get("LAB_TRACE_FILE", os.path.join(os.getcwd(), "traces.jsonl"))
+
+# Once the trace file reaches this size it is moved to "<TRACE_FILE>.1" (replacing the
+# previous one) and a new file is started, so the Admin page never reads more than this
+TRACE_FILE_MAX_BYTES = int(os.environ.get("LAB_TRACE_FILE_MAX_BYTES", 10 * 2**20))
+
+# Spans kept in memory for the Prometheus endpoint
+RECENT_SPANS = 5000
+
+# Pass this to chat.completions.create(stream=True) so the last chunk carries token usage
+STREAM_USAGE = {"include_usage": True}
+
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_SPANS)
+_pending = queue.Queue()  # (trace file, span) pairs waiting for the writer thread
+_writer = None
+
+
+# Function to record one finished span. The span is written to the trace file by a
+# background thread, so callers (including the asyncio loop thread) never wait for disk.
+def record_span(name, seconds, lab=None, model=None, **attributes):
+    record = {"ts": time.time(), "name": name, "lab": lab, "model": model, "seconds": round(seconds, 6)}
+    record.update({key: value for key, value in attributes.items() if value is not None})
+    with _lock:
+        _recent.append(record)
+    if TRACE_FILE:
+        _start_writer()
+        _pending.put((TRACE_FILE, record))
+    return record
+
+
+# Function to wait until every recorded span has been written to the trace file
+def flush_spans():
+    _pending.join()
+
+
+def _start_writer():
+    global _writer
+    if _writer is None:
+        with _lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_write_spans, name="trace-writer", daemon=True)
+                _writer.start()
+
+
+# Writer thread: appends spans in batches, rotating the file once it reaches TRACE_FILE_MAX_BYTES
+def _write_spans():
+    while True:
+        batch = [_pending.get()]
+        while True:
+            try:
+                batch.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            by_path = {}
+            for path, record in batch:
+                by_path.setdefault(path, []).append(json.dumps(record, default=str) + "\n")
+            for path, lines in by_path.items():
+                if os.path.exists(path) and os.path.getsize(path) >= TRACE_FILE_MAX_BYTES:
+                    os.replace(path, path + ".1")
+                with open(path, "a", encoding="utf-8") as file:
+                    file.writelines(lines)
+        except Exception:
+            # Tracing must never break a page, nor stop the writer (flush_spans waits for it)
+            pass
+        finally:
+            for _ in batch:
+                _pending.task_done()
+
+
+# Spans recorded just before the process exits are still written
+atexit.register(flush_spans)
+
+
+# Function to copy token counts from an OpenAI `usage` object onto span attributes
+def add_usage(attributes, usage):
+    if usage is not None:
+        attributes["prompt_tokens"] = getattr(usage, "prompt_tokens", None)
+        attributes["completion_tokens"] = getattr(usage, "completion_tokens", None)
+
+
+# Context manager that times a block. The yielded dict can be filled with extra attributes
+# (e.g. via `add_usage`) before the span is recorded.
+@contextmanager
+def span(name, lab=None, model=None, **attributes):
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except Exception as error:
+        attributes["error"] = type(error).__name__
+        raise
+    finally:
+        record_span(name, time.perf_counter() - start, lab, model, **attributes)
+
+
+# Function to pass a streaming chat completion through as text pieces while recording the
+# time to first token, the total stream time and (with STREAM_USAGE) the token counts
+def trace_chat_stream(stream, lab, model, name="chat"):
+    start = time.perf_counter()
+    attributes = {}
+    try:
+        for part in stream:
+            add_usage(attributes, getattr(part, "usage", None))
+            if part.choices and part.choices[0].delta.content:
+                attributes.setdefault("first_token_seconds", round(time.perf_counter() - start, 6))
+                yield part.choices[0].delta.content
+    finally:
+        record_span(name, time.perf_counter() - start, lab, model, **attributes)
+
+
+# Async counterpart of `trace_chat_stream`. `attributes` (filled in as the stream is read,
+# e.g. "first_token_seconds") lets the caller see the span's numbers, and `start` (a
+# time.perf_counter() value) times the span from when the request was sent.
+async def trace_async_chat_stream(stream, lab, model, name="chat", attributes=None, start=None):
+    start = time.perf_counter() if start is None else start
+    attributes = {} if attributes is None else attributes
+    try:
+        async for part in stream:
+            add_usage(attributes, getattr(part, "usage", None))
+            if part.choices and part.choices[0].delta.content:
+                attributes.setdefault("first_token_seconds", round(time.perf_counter() - start, 6))
+                yield part.choices[0].delta.content
+    finally:
+        record_span(name, time.perf_counter() - start, lab, model, **attributes)
+
+
+# Function to read the most recent spans from the trace file
+def load_spans(limit=50000, path=None):
+    path = path or TRACE_FILE
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        lines = deque(file, maxlen=limit)
+    spans = []
+    for line in lines:
+        try:
+            spans.append(json.loads(line))
+        except ValueError:
+            continue
+    return spans
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# Function to aggregate spans per (lab, model, name): count, p50/p95 latency, time to first
+# token, token spend and (for cache lookups, whose spans carry `hit`) the hit rate
+def summarize_spans(spans):
+    groups = {}
+    for record in spans:
+        key = (record.get("lab") or "-", record.get("model") or "-", record["name"])
+        groups.setdefault(key, []).append(record)
+    rows = []
+    for (lab, model, name), records in sorted(groups.items()):
+        seconds = sorted(record["seconds"] for record in records)
+        first_tokens = sorted(record["first_token_seconds"] for record in records if "first_token_seconds" in record)
+        lookups = [record["hit"] for record in records if "hit" in record]
+        rows.append({
+            "lab": lab,
+            "model": model,
+            "span": name,
+            "count": len(records),
+            "errors": sum(1 for record in records if record.get("error")),
+            "p50_ms": round(_percentile(seconds, 0.5) * 1000, 1),
+            "p95_ms": round(_percentile(seconds, 0.95) * 1000, 1),
+            "p50_ttft_ms": round(_percentile(first_tokens, 0.5) * 1000, 1) if first_tokens else None,
+            "prompt_tokens": sum(record.get("prompt_tokens") or 0 for record in records),
+            "completion_tokens": sum(record.get("completion_tokens") or 0 for record in records),
+            "hit_rate": round(sum(lookups) / len(lookups), 3) if lookups else None,
+        })
+    return rows
+
+
+# Function to render the in-memory spans in the Prometheus text exposition format
+def prometheus_text():
+    with _lock:
+        spans = list(_recent)
+    lines = [
+        "# HELP lab_span_seconds Latency of instrumented stages.",
+        "# TYPE lab_span_seconds summary",
+    ]
+    rows = summarize_spans(spans)
+    for row in rows:
+        labels = f'lab="{row["lab"]}",model="{row["model"]}",span="{row["span"]}"'
+        lines.append(f'lab_span_seconds{{{labels},quantile="0.5"}} {row["p50_ms"] / 1000}')
+        lines.append(f'lab_span_seconds{{{labels},quantile="0.95"}} {row["p95_ms"] / 1000}')
+        lines.append(f"lab_span_seconds_count{{{labels}}} {row['count']}")
+    lines += ["# HELP lab_tokens_total Tokens sent to and received from the models.", "# TYPE lab_tokens_total counter"]
+    for row in rows:
+        labels = f'lab="{row["lab"]}",model="{row["model"]}",span="{row["span"]}"'
+        lines.append(f'lab_tokens_total{{{labels},kind="prompt"}} {row["prompt_tokens"]}')
+        lines.append(f'lab_tokens_total{{{labels},kind="completion"}} {row["completion_tokens"]}')
+    lines += ["# HELP lab_cache_hit_ratio Share of cache lookups answered from the cache.", "# TYPE lab_cache_hit_ratio gauge"]
+    for row in rows:
+        if row["hit_rate"] is not None:
+            labels = f'lab="{row["lab"]}",model="{row["model"]}",span="{row["span"]}"'
+            lines.append(f"lab_cache_hit_ratio{{{labels}}} {row['hit_rate']}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200 if self.path.rstrip("/") in ("", "/metrics") else 404)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_metrics_server = None
+
+
+# Function to serve `prometheus_text()` on http://127.0.0.1:<port>/metrics (once per process)
+def start_metrics_server(port):
+    global _metrics_server
+    with _lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    return _metrics_server
@@ -0,0 +1,331 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+# HNSW settings: Chroma's defaults, except ef_search (Chroma: 10), raised for better recall
+# (see benchmarks/bench_vector_store.py)
+DEFAULT_HNSW_M = 16
+DEFAULT_HNSW_EF_CONSTRUCTION = 100
+DEFAULT_HNSW_EF_SEARCH = 50
+
+# Chunks copied per request when one collection is copied into another
+COPY_BATCH_SIZE = 1000
+
+# Stored vectors scored per step by the flat store (bounds the float32 copy of int8 rows)
+QUERY_BLOCK_ROWS = 4096
+
+# Default settings for the Lab 4 document store. `dimensions` asks text-embedding-3-small for
+# shorter vectors (None keeps all 1536); `quantization` ("none" or "int8") only applies to the
+# flat backend.
+DEFAULT_STORE_CONFIG = {
+    "backend": "chroma",
+    "hnsw_m": DEFAULT_HNSW_M,
+    "hnsw_ef_construction": DEFAULT_HNSW_EF_CONSTRUCTION,
+    "hnsw_ef_search": DEFAULT_HNSW_EF_SEARCH,
+    "dimensions": None,
+    "quantization": "none",
+}
+
+
+# Function to describe the settings that change the stored vectors, for the ingestion manifest
+def store_signature(config):
+    config = dict(DEFAULT_STORE_CONFIG, **(config or {}))
+    return f"{config['backend']}:{config['dimensions'] or 'full'}:{config['quantization']}"
+
+
+# Function to quantize unit vectors to int8 with one scale per vector
+def quantize_int8(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+# Function to shorten embeddings to `dimensions` and re-normalize them. text-embedding-3
+# vectors keep their meaning when truncated this way.
+def truncate_embeddings(vectors, dimensions):
+    vectors = np.asarray(vectors, dtype=np.float32)[:, :dimensions]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class FlatVectorStore:
+    """Exact (brute-force) cosine search over NumPy vectors.
+
+    Implements the subset of the Chroma collection API that Lab 4 uses (upsert, delete, get,
+    query, count), so small corpora can skip the HNSW graph entirely. Vectors can be stored
+    as float32 or int8 with a per-vector scale. Rows are appended in place and only written
+    to disk by `flush()` (ingest_folder calls it once at the end), so ingesting a folder
+    document by document stays linear. With `path=None` the store only lives in memory (e.g.
+    the per-session index of an uploaded document).
+    """
+
+    def __init__(self, path, name, quantization="none", dimensions=None):
+        self.quantization = quantization
+        self.dimensions = dimensions
+        self._records_path = None
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self._records_path = os.path.join(path, f"{name}.records.json")
+            self._vectors_path = os.path.join(path, f"{name}.vectors.npy")
+            self._scales_path = os.path.join(path, f"{name}.scales.npy")
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        self.ids, self.documents, self.metadatas = [], [], []
+        self._vectors = None  # rows beyond len(self.ids) are spare capacity
+        self._scales = None
+        self._positions = {}
+        self._dirty = False
+        if self._records_path and os.path.exists(self._records_path):
+            with open(self._records_path, "r", encoding="utf-8") as file:
+                records = json.load(file)
+            if (records.get("quantization"), records.get("dimensions")) != (self.quantization, self.dimensions):
+                # Stored with other settings: start empty so the manifest triggers a re-index
+                return
+            self.ids, self.documents, self.metadatas = records["ids"], records["documents"], records["metadatas"]
+        if self.ids:
+            # Memory-mapped until the first change
+            self._vectors = np.load(self._vectors_path, mmap_mode="r")
+            if self.quantization == "int8":
+                self._scales = np.load(self._scales_path)
+        self._positions = {doc_id: position for position, doc_id in enumerate(self.ids)}
+
+    @property
+    def vectors(self):
+        return None if self._vectors is None else self._vectors[:len(self.ids)]
+
+    @property
+    def scales(self):
+        return None if self._scales is None else self._scales[:len(self.ids)]
+
+    # Function to write the store to disk if it changed. Files are written to temporary names
+    # first so readers of the folder never see a half-written index.
+    def flush(self):
+        with self._lock:
+            if self._records_path is None or not self._dirty:
+                return
+
+            def save_array(target, array):
+                temp_path = target + ".tmp.npy"
+                np.save(temp_path, array)
+                os.replace(temp_path, target)
+
+            if self.ids:
+                save_array(self._vectors_path, self.vectors)
+                if self.scales is not None:
+                    save_array(self._scales_path, self.scales)
+            temp_path = self._records_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump({
+                    "ids": self.ids,
+                    "documents": self.documents,
+                    "metadatas": self.metadatas,
+                    "quantization": self.quantization,
+                    "dimensions": self.dimensions,
+                }, file)
+            os.replace(temp_path, self._records_path)
+            self._dirty = False
+
+    def _encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.quantization == "int8":
+            return quantize_int8(vectors)
+        return vectors, None
+
+    # Function to make room for `count` rows, doubling the arrays so appends stay cheap
+    def _reserve(self, count, width):
+        size = len(self.ids)
+        if self._vectors is not None and not isinstance(self._vectors, np.memmap) and len(self._vectors) >= count:
+            return
+        capacity = max(count, 2 * size, 64)
+        dtype = np.int8 if self.quantization == "int8" else np.float32
+        vectors = np.zeros((capacity, width), dtype=dtype)
+        if size:
+            vectors[:size] = self._vectors[:size]
+        self._vectors = vectors
+        if self.quantization == "int8":
+            scales = np.ones(capacity, dtype=np.float32)
+            if size:
+                scales[:size] = self._scales[:size]
+            self._scales = scales
+
+    def _float_rows(self, positions):
+        rows = np.asarray(self._vectors[positions], dtype=np.float32)
+        return rows * self._scales[positions][:, None] if self._scales is not None else rows
+
+    def count(self):
+        return len(self.ids)
+
+    def _matching_positions(self, ids=None, where=None):
+        if ids is not None:
+            return [self._positions[doc_id] for doc_id in ids if doc_id in self._positions]
+        positions = range(len(self.ids))
+        if where:
+            positions = [
+                position for position in positions
+                if all(self.metadatas[position].get(key) == value for key, value in where.items())
+            ]
+        return list(positions)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        if not len(ids):
+            return
+        encoded, scales = self._encode(embeddings)
+        with self._lock:
+            new_ids = [doc_id for doc_id in dict.fromkeys(ids) if doc_id not in self._positions]
+            self._reserve(len(self.ids) + len(new_ids), encoded.shape[1])
+            for index, doc_id in enumerate(ids):
+                document = documents[index] if documents else None
+                metadata = metadatas[index] if metadatas else {}
+                position = self._positions.get(doc_id)
+                if position is None:
+                    position = self._positions[doc_id] = len(self.ids)
+                    self.ids.append(doc_id)
+                    self.documents.append(document)
+                    self.metadatas.append(metadata)
+                else:
+                    self.documents[position], self.metadatas[position] = document, metadata
+                self._vectors[position] = encoded[index]
+                if scales is not None:
+                    self._scales[position] = scales[index]
+            self._dirty = True
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            removed = set(self._matching_positions(ids, where))
+            if not removed:
+                return
+            keep = [position for position in range(len(self.ids)) if position not in removed]
+            self._vectors = np.array(self._vectors[keep]) if keep else None
+            self._scales = np.array(self._scales[keep]) if keep and self._scales is not None else None
+            self.ids = [self.ids[position] for position in keep]
+            self.documents = [self.documents[position] for position in keep]
+            self.metadatas = [self.metadatas[position] for position in keep]
+            self._positions = {doc_id: position for position, doc_id in enumerate(self.ids)}
+            self._dirty = True
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas")):
+        with self._lock:
+            positions = self._matching_positions(ids, where)
+            result = {"ids": [self.ids[position] for position in positions]}
+            if "documents" in include:
+                result["documents"] = [self.documents[position] for position in positions]
+            if "metadatas" in include:
+                result["metadatas"] = [self.metadatas[position] for position in positions]
+            if "embeddings" in include:
+                result["embeddings"] = list(self._float_rows(positions)) if positions else []
+            return result
+
+    # Function to score the queries against every stored vector, QUERY_BLOCK_ROWS rows at a
+    # time so int8 vectors are never converted to float32 all at once
+    def _similarities(self, queries):
+        size = len(self.ids)
+        similarities = np.empty((len(queries), size), dtype=np.float32)
+        for start in range(0, size, QUERY_BLOCK_ROWS):
+            end = min(start + QUERY_BLOCK_ROWS, size)
+            block = self._vectors[start:end]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            similarities[:, start:end] = queries @ block.T
+            if self._scales is not None:
+                similarities[:, start:end] *= self._scales[start:end][None, :]
+        return similarities
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances")):
+        with self._lock:
+            result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+            if not self.ids:
+                for _ in query_embeddings:
+                    for key in result:
+                        result[key].append([])
+                return result
+            similarities = self._similarities(np.asarray(query_embeddings, dtype=np.float32))
+            n_results = min(n_results, len(self.ids))
+            for row in similarities:
+                top = np.argpartition(-row, n_results - 1)[:n_results]
+                top = top[np.argsort(-row[top])]
+                result["ids"].append([self.ids[position] for position in top])
+                result["documents"].append([self.documents[position] for position in top])
+                result["metadatas"].append([self.metadatas[position] for position in top])
+                result["distances"].append([float(1 - row[position]) for position in top])
+            return {key: value for key, value in result.items() if key == "ids" or key in include}
+
+
+# Function to copy every chunk, with its embedding, from one collection into another (e.g. to
+# seed a staging index from the live one without embedding anything again)
+def copy_collection(source_collection, target_collection, batch_size=COPY_BATCH_SIZE):
+    chunk_ids = source_collection.get(include=[])["ids"]
+    for start in range(0, len(chunk_ids), batch_size):
+        batch = source_collection.get(
+            ids=chunk_ids[start:start + batch_size], include=["documents", "metadatas", "embeddings"]
+        )
+        target_collection.upsert(
+            ids=batch["ids"],
+            documents=batch["documents"],
+            metadatas=batch["metadatas"],
+            embeddings=[list(map(float, embedding)) for embedding in batch["embeddings"]],
+        )
+    return len(chunk_ids)
+
+
+# Function to write a store's pending changes to disk (Chroma collections persist on their own)
+def flush_vector_store(collection):
+    if isinstance(collection, FlatVectorStore):
+        collection.flush()
+
+
+# Function to open the document store described by `config` inside `db_path`
+def open_vector_store(db_path, name, config=None):
+    config = dict(DEFAULT_STORE_CONFIG, **(config or {}))
+    if config["backend"] == "flat":
+        return FlatVectorStore(db_path, name, config["quantization"], config["dimensions"])
+
+    from shared_clients import get_chroma_client
+
+    db_client = get_chroma_client(db_path)
+    metadata = chroma_metadata(config)
+    if name not in [getattr(collection, "name", collection) for collection in db_client.list_collections()]:
+        return db_client.create_collection(name, metadata=metadata)
+    collection = db_client.get_collection(name)
+    stored = dict(collection.metadata or {})
+    # Collections created before the dimensions were recorded hold full-size vectors
+    stored.setdefault("lab:dimensions", 0)
+    if stored.get("lab:dimensions") != metadata["lab:dimensions"]:
+        # Vectors of another size cannot share the collection: start empty, and the ingestion
+        # manifest (whose signature includes the dimensions) re-embeds every PDF
+        db_client.delete_collection(name)
+        return db_client.create_collection(name, metadata=metadata)
+    if any(stored.get(key) != value for key, value in metadata.items()):
+        # HNSW settings are fixed when a collection is created: rebuild the graph from the
+        # stored vectors (nothing is embedded again)
+        return rebuild_chroma_collection(db_client, collection, name, metadata)
+    return collection
+
+
+# Function to describe a store config as Chroma collection metadata
+def chroma_metadata(config):
+    return {
+        "hnsw:space": "cosine",
+        "hnsw:M": config["hnsw_m"],
+        "hnsw:construction_ef": config["hnsw_ef_construction"],
+        "hnsw:search_ef": config["hnsw_ef_search"],
+        "lab:dimensions": config["dimensions"] or 0,
+    }
+
+
+# Function to copy a Chroma collection into a new one created with `metadata`, then put it
+# in place of the old one under the same name
+def rebuild_chroma_collection(db_client, collection, name, metadata):
+    rebuild_name = f"{name}_rebuild"
+    if rebuild_name in [getattr(existing, "name", existing) for existing in db_client.list_collections()]:
+        db_client.delete_collection(rebuild_name)
+    rebuilt = db_client.create_collection(rebuild_name, metadata=metadata)
+    copy_collection(collection, rebuilt)
+    db_client.delete_collection(name)
+    rebuilt.modify(name=name)
+    return db_client.get_collection(name)
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+DEFAULT_LOCATION = "Syracuse, NY"
+
+# Seconds to wait for OpenWeatherMap (connect, read)
+REQUEST_TIMEOUT = (3.05, 10)
+
+# Cached weather is reused for this long
+CACHE_TTL_SECONDS = 10 * 60
+CACHE_MAX_ENTRIES = 500
+
+MAX_CONCURRENT_LOOKUPS = 8
+
+
+class WeatherError(Exception):
+    """Raised when the weather for a city cannot be retrieved."""
+
+
+# Function to turn user input into the city name sent to the API ("Syracuse, NY" -> "syracuse")
+def normalize_city(location):
+    location = (location or DEFAULT_LOCATION).strip() or DEFAULT_LOCATION
+    return location.split(",")[0].strip().lower()
+
+
+class WeatherProvider:
+    """OpenWeatherMap client with a pooled session, timeouts and a TTL cache per city."""
+
+    def __init__(self, api_key, base_url=OPENWEATHER_URL, ttl_seconds=CACHE_TTL_SECONDS, timeout=REQUEST_TIMEOUT):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENT_LOOKUPS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = {"hits": 0, "misses": 0}
+        self._cache = {}  # city -> (fetched_at, weather_info)
+        self._lock = threading.Lock()
+
+    # Function to get the current weather for a location (served from cache when fresh)
+    def get_current_weather(self, location):
+        city = normalize_city(location)
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(city)
+            if cached and now - cached[0] < self.ttl_seconds:
+                self.stats["hits"] += 1
+                return cached[1]
+            self.stats["misses"] += 1
+
+        weather_info = self._fetch(city)
+        with self._lock:
+            self._cache[city] = (time.time(), weather_info)
+            # Drop the oldest entries once the cache is full
+            while len(self._cache) > CACHE_MAX_ENTRIES:
+                del self._cache[min(self._cache, key=lambda key: self._cache[key][0])]
+        return weather_info
+
+    # Function to look up several cities concurrently, e.g. for a trip itinerary.
+    # Returns {location: weather_info or WeatherError} in the order given.
+    def get_weather_for_cities(self, locations):
+        def lookup(location):
+            try:
+                return self.get_current_weather(location)
+            except WeatherError as error:
+                return error
+
+        locations = list(locations)
+        if not locations:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_LOOKUPS, len(locations))) as pool:
+            return dict(zip(locations, pool.map(lookup, locations)))
+
+    def _fetch(self, city):
+        try:
+            response = self.session.get(
+                self.base_url, params={"q": city, "appid": self.api_key}, timeout=self.timeout
+            )
+            data = response.json()
+        except requests.RequestException as error:
+            raise WeatherError(f"Could not reach the weather service: {error}") from error
+        except ValueError as error:
+            raise WeatherError("The weather service returned an invalid response.") from error
+
+        # Errors (unknown city, bad key, rate limit) come back without a "main" section
+        if "main" not in data:
+            message = data.get("message") or f"HTTP {response.status_code}"
+            raise WeatherError(f"No weather found for '{city}': {message}")
+
+        # Extract temperatures & Convert Kelvin to Celsius
+        main = data["main"]
+        return {
+            "location": data.get("name") or city.title(),
+            "temperature": round(main["temp"] - 273.15, 2),
+            "feels_like": round(main["feels_like"] - 273.15, 2),
+            "temp_min": round(main["temp_min"] - 273.15, 2),
+            "temp_max": round(main["temp_max"] - 273.15, 2),
+            "humidity": round(main["humidity"], 2),
+        }